@@ -1,6 +1,7 @@
 import csv
 import numpy as np
-from scipy.interpolate import interp1d
+
+from results_table import ResultsTable, parse_bboxes, read_results, write_results
 
 def load_csv(file_path):
     """Loads a CSV file and returns the data as a list of dictionaries."""
@@ -15,78 +16,112 @@ def save_csv(file_path, data, header):
         writer.writeheader()
         writer.writerows(data)
 
+def interpolate_tracks(frame_numbers, car_ids, car_bboxes, license_plate_bboxes):
+    """
+    Fills the frame gaps of every car track by linear interpolation, fully vectorized.
+
+    The rows are sorted by (car_id, frame_nmr) once; each row then expands into the
+    interpolated frames between it and the previous row of the same car, followed by
+    itself, using the same arithmetic as scipy's interp1d.
+
+    Returns:
+        dict: Arrays 'frame_nmr', 'car_id', 'car_bbox', 'license_plate_bbox' and 'source',
+        the index of the input row for original rows and -1 for interpolated ones.
+    """
+    frame_numbers = np.asarray(frame_numbers, dtype=np.int64)
+    car_ids = np.asarray(car_ids, dtype=np.int64)
+    order = np.lexsort((frame_numbers, car_ids))
+    frames = frame_numbers[order]
+    cars = car_ids[order]
+    bboxes = np.hstack((np.asarray(car_bboxes, dtype=float).reshape(-1, 4),
+                        np.asarray(license_plate_bboxes, dtype=float).reshape(-1, 4)))[order]
+
+    # Every row covers the frames since the previous row of its car: the gap, then itself
+    gaps = np.ones(len(frames), dtype=np.int64)
+    same_car = cars[1:] == cars[:-1]
+    gaps[1:][same_car] = np.maximum(np.diff(frames)[same_car], 1)
+
+    src = np.repeat(np.arange(len(frames)), gaps)
+    step = np.arange(len(src)) - np.repeat(np.cumsum(gaps) - gaps, gaps) + 1
+    gap = gaps[src]
+    interpolated = step != gap
+
+    values = bboxes[src]
+    lo = bboxes[src[interpolated] - 1]
+    slope = (values[interpolated] - lo) / gap[interpolated][:, None]
+    values[interpolated] = slope * step[interpolated][:, None] + lo
+
+    source = order[src]
+    source[interpolated] = -1
+    return {
+        'frame_nmr': frames[src] - gap + step,
+        'car_id': cars[src],
+        'car_bbox': values[:, :4],
+        'license_plate_bbox': values[:, 4:],
+        'source': source
+    }
+
 def interpolate_bounding_boxes(data):
     """Interpolates missing bounding boxes for detected cars."""
-    frame_numbers = np.array([int(row['frame_nmr']) for row in data])
-    car_ids = np.array([int(float(row['car_id'])) for row in data])
-    car_bboxes = np.array([list(map(float, row['car_bbox'][1:-1].split())) for row in data])
-    license_plate_bboxes = np.array([list(map(float, row['license_plate_bbox'][1:-1].split())) for row in data])
+    if not data:
+        return []
+
+    tracks = interpolate_tracks([int(row['frame_nmr']) for row in data],
+                                [int(float(row['car_id'])) for row in data],
+                                parse_bboxes(row['car_bbox'] for row in data),
+                                parse_bboxes(row['license_plate_bbox'] for row in data))
 
     interpolated_data = []
-    unique_car_ids = np.unique(car_ids)
-    for car_id in unique_car_ids:
-        frame_numbers_ = [p['frame_nmr'] for p in data if int(float(p['car_id'])) == int(float(car_id))]
-        
-        car_mask = car_ids == car_id
-        car_frame_numbers = frame_numbers[car_mask]
-        car_bboxes_interpolated = []
-        license_plate_bboxes_interpolated = []
-        
-        first_frame_number = car_frame_numbers[0]
-        
-        for i in range(len(car_bboxes[car_mask])):
-            frame_number = car_frame_numbers[i]
-            car_bbox = car_bboxes[car_mask][i]
-            license_plate_bbox = license_plate_bboxes[car_mask][i]
-
-            if i > 0:
-                prev_frame_number = car_frame_numbers[i - 1]
-                prev_car_bbox = car_bboxes_interpolated[-1]
-                prev_license_plate_bbox = license_plate_bboxes_interpolated[-1]
-
-                if frame_number - prev_frame_number > 1:
-                    frames_gap = frame_number - prev_frame_number
-                    x = np.array([prev_frame_number, frame_number])
-                    x_new = np.linspace(prev_frame_number, frame_number, num=frames_gap, endpoint=False)
-                    
-                    car_interp_func = interp1d(x, np.vstack((prev_car_bbox, car_bbox)), axis=0, kind='linear')
-                    license_interp_func = interp1d(x, np.vstack((prev_license_plate_bbox, license_plate_bbox)), axis=0, kind='linear')
-                    
-                    car_bboxes_interpolated.extend(car_interp_func(x_new)[1:])
-                    license_plate_bboxes_interpolated.extend(license_interp_func(x_new)[1:])
-
-            car_bboxes_interpolated.append(car_bbox)
-            license_plate_bboxes_interpolated.append(license_plate_bbox)
-
-        for i in range(len(car_bboxes_interpolated)):
-            frame_number = first_frame_number + i
-            row = {
-                'frame_nmr': str(frame_number),
-                'car_id': str(car_id),
-                'car_bbox': ' '.join(map(str, car_bboxes_interpolated[i])),
-                'license_plate_bbox': ' '.join(map(str, license_plate_bboxes_interpolated[i]))
-            }
-
-            if str(frame_number) not in frame_numbers_:
-                row['license_plate_bbox_score'] = '0'
-                row['license_number'] = '0'
-                row['license_number_score'] = '0'
-            else:
-                original_row = next((p for p in data if int(p['frame_nmr']) == frame_number and int(float(p['car_id'])) == int(float(car_id))), None)
-                row['license_plate_bbox_score'] = original_row.get('license_plate_bbox_score', '0')
-                row['license_number'] = original_row.get('license_number', '0')
-                row['license_number_score'] = original_row.get('license_number_score', '0')
-                row['license_plate_color'] = original_row.get('license_plate_color', '0')
-            interpolated_data.append(row)
-    
+    for frame_number, car_id, car_bbox, license_plate_bbox, source in zip(tracks['frame_nmr'].tolist(),
+                                                                           tracks['car_id'].tolist(),
+                                                                           tracks['car_bbox'].tolist(),
+                                                                           tracks['license_plate_bbox'].tolist(),
+                                                                           tracks['source'].tolist()):
+        row = {
+            'frame_nmr': str(frame_number),
+            'car_id': str(car_id),
+            'car_bbox': ' '.join(map(str, car_bbox)),
+            'license_plate_bbox': ' '.join(map(str, license_plate_bbox))
+        }
+
+        if source == -1:
+            row['license_plate_bbox_score'] = '0'
+            row['license_number'] = '0'
+            row['license_number_score'] = '0'
+        else:
+            original_row = data[source]
+            row['license_plate_bbox_score'] = original_row.get('license_plate_bbox_score', '0')
+            row['license_number'] = original_row.get('license_number', '0')
+            row['license_number_score'] = original_row.get('license_number_score', '0')
+            row['license_plate_color'] = original_row.get('license_plate_color', '0')
+        interpolated_data.append(row)
+
     return interpolated_data
 
+def interpolate_results(table):
+    """
+    Interpolates missing bounding boxes of a ResultsTable and returns the filled-in table.
+
+    Interpolated rows get '0' as license number, zero scores and no color.
+    """
+    tracks = interpolate_tracks(table['frame_nmr'], table['car_id'], table['car_bbox'], table['license_plate_bbox'])
+    source = tracks['source']
+    original = source >= 0
+    columns = {name: tracks[name] for name in ('frame_nmr', 'car_id', 'car_bbox', 'license_plate_bbox')}
+    for name, fill in (('license_plate_bbox_score', 0.0), ('license_number', '0'), ('license_number_score', 0.0),
+                       ('license_plate_color', '')):
+        column = np.full(len(source), fill, dtype=table[name].dtype)
+        column[original] = table[name][source[original]]
+        columns[name] = column
+    return ResultsTable(columns)
+
 def process_interpolation(input_csv, output_csv):
-    """Loads the CSV, interpolates bounding boxes, and saves the results."""
-    data = load_csv(input_csv)
-    interpolated_data = interpolate_bounding_boxes(data)
-    header = ['frame_nmr', 'car_id', 'car_bbox', 'license_plate_bbox', 'license_plate_bbox_score', 'license_number', 'license_number_score', "license_plate_color"]
-    save_csv(output_csv, interpolated_data, header)
+    """
+    Loads the results, interpolates bounding boxes, and saves them.
+
+    Either path can be a CSV file or a column directory (see results_table); returns output_csv.
+    """
+    return write_results(interpolate_results(read_results(input_csv)), output_csv)
 
 # Example usage
 # process_interpolation('test.csv', 'test_interpolated.csv')
@@ -0,0 +1,83 @@
+"""
+Scaling benchmark for sort.associate_detections_to_trackers on synthetic crowded frames.
+
+Each frame holds n tracked boxes scattered over a canvas that grows with n, so the
+crowd density stays constant; the detections are the tracks moved by a few pixels,
+with some tracks missed and some new boxes. The gated association is compared with
+the previous implementation (one assignment over the whole IOU matrix, then Python
+membership tests), which is kept here as a reference.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sort.sort import associate_detections_to_trackers, iou_batch, linear_assignment
+from benchmarks.timing import best_time
+
+
+def reference_association(detections, trackers, iou_threshold=0.3):
+    """The association before gating: full assignment and per-box membership tests."""
+    iou_matrix = iou_batch(detections, trackers)
+    a = (iou_matrix > iou_threshold).astype(np.int32)
+    if a.sum(1).max() == 1 and a.sum(0).max() == 1:
+        matched_indices = np.stack(np.where(a), axis=1)
+    else:
+        matched_indices = linear_assignment(-iou_matrix)
+    unmatched_detections = [d for d in range(len(detections)) if d not in matched_indices[:, 0]]
+    unmatched_trackers = [t for t in range(len(trackers)) if t not in matched_indices[:, 1]]
+    matches = []
+    for m in matched_indices:
+        if iou_matrix[m[0], m[1]] < iou_threshold:
+            unmatched_detections.append(m[0])
+            unmatched_trackers.append(m[1])
+        else:
+            matches.append(m)
+    return np.array(matches).reshape(-1, 2), np.array(unmatched_detections), np.array(unmatched_trackers)
+
+
+def crowded_frame(n_boxes, density=0.0005, miss_rate=0.05, new_rate=0.05, jitter=4.0, seed=0):
+    """Returns (detections, trackers) for one crowded frame of about n_boxes boxes."""
+    rng = np.random.RandomState(seed)
+    side = np.sqrt(n_boxes / density)
+    xy = rng.uniform(0, side, size=(n_boxes, 2))
+    wh = rng.uniform(15, 45, size=(n_boxes, 2))
+    trackers = np.hstack((xy, xy + wh))
+
+    kept = trackers[rng.uniform(size=n_boxes) >= miss_rate]
+    detections = kept + rng.normal(0, jitter, size=kept.shape)
+    n_new = int(n_boxes * new_rate)
+    new_xy = rng.uniform(0, side, size=(n_new, 2))
+    new = np.hstack((new_xy, new_xy + rng.uniform(15, 45, size=(n_new, 2))))
+    detections = np.vstack((detections, new))[rng.permutation(len(kept) + n_new)]
+    return np.hstack((detections, np.ones((len(detections), 1)))), np.hstack((trackers, np.zeros((n_boxes, 1))))
+
+
+def same_association(a, b):
+    """Same matched pairs and the same unmatched boxes."""
+    return (set(map(tuple, a[0])) == set(map(tuple, b[0])) and
+            set(a[1].tolist()) == set(b[1].tolist()) and set(a[2].tolist()) == set(b[2].tolist()))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Association scaling benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200, 500, 1000, 2000, 3000],
+                        help='Numbers of tracked boxes per frame.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size; the best time is reported.')
+    parser.add_argument('--density', type=float, default=0.0005, help='Boxes per square pixel of the synthetic canvas.')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    print('{:>8} {:>8} {:>14} {:>12} {:>8} {:>6}'.format('boxes', 'matches', 'reference (s)', 'gated (s)', 'speedup', 'same'))
+    for n_boxes in args.sizes:
+        detections, trackers = crowded_frame(n_boxes, density=args.density)
+        reference, reference_seconds = best_time(lambda: reference_association(detections, trackers), args.repeat)
+        gated, gated_seconds = best_time(lambda: associate_detections_to_trackers(detections, trackers), args.repeat)
+        print('{:>8} {:>8} {:>14.4f} {:>12.4f} {:>7.1f}x {:>6}'.format(
+            n_boxes, len(gated[0]), reference_seconds, gated_seconds, reference_seconds / gated_seconds,
+            'yes' if same_association(reference, gated) else 'NO'))
@@ -0,0 +1,66 @@
+"""
+Benchmark of processingVideo.classify_license_plate_colors on random plate crops.
+
+Every crop has a random size and a random base color with pixel noise, so all color
+classes come up. classify_license_plate_colors (cv2.mean on the uint8 HSV pixels) is
+compared with the previous classifier (np.mean over the HSV pixels as floats), which is
+kept here as a reference; tests/test_colors.py checks that both give the same labels.
+"""
+import argparse
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from processingVideo import classify_license_plate_colors
+from benchmarks.timing import best_time
+
+
+def reference_color(license_plate_crop):
+    """The per-crop classifier before batching."""
+    hsv = cv2.cvtColor(license_plate_crop, cv2.COLOR_BGR2HSV)
+    avg_color = np.mean(hsv, axis=(0, 1))
+    h, s, v = avg_color
+
+    if 35 <= h <= 85 and s > 50 and v > 50:
+        return "Green"
+    elif 20 <= h <= 35 and s > 50 and v > 50:
+        return "Yellow"
+    elif v > 150 and s < 50:
+        return "White"
+    elif 20 <= h <= 35 and s > 50 and v > 50 and np.mean(hsv[:, :, 2]) < 100:
+        return "Yellow text on Green"
+    else:
+        return "Unknown"
+
+
+def random_crops(n, seed=0):
+    rng = np.random.RandomState(seed)
+    crops = []
+    for _ in range(n):
+        height, width = rng.randint(8, 80), rng.randint(20, 240)
+        base = rng.randint(0, 256, size=3)
+        noise = rng.randint(-40, 41, size=(height, width, 3))
+        crops.append(np.clip(base + noise, 0, 255).astype(np.uint8))
+    return crops
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Plate color benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 3000], help='Numbers of crops per call.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size; the best time is reported.')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    print('{:>8} {:>14} {:>12} {:>8}'.format('crops', 'reference (s)', 'new (s)', 'speedup'))
+    for n_crops in args.sizes:
+        crops = random_crops(n_crops)
+        _, reference_seconds = best_time(lambda: [reference_color(crop) for crop in crops], args.repeat)
+        _, new_seconds = best_time(lambda: classify_license_plate_colors(crops), args.repeat)
+        print('{:>8} {:>14.4f} {:>12.4f} {:>7.1f}x'.format(
+            n_crops, reference_seconds, new_seconds, reference_seconds / new_seconds))
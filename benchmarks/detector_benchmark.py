@@ -0,0 +1,78 @@
+"""
+Compares the vehicle and license plate detectors on CPU across inference backends.
+
+Runs the PyTorch models and their ONNX / OpenVINO exports (exported on first use and
+cached next to the weights) over the first frames of a video, in batches, and prints
+frames per second for each backend.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import model_registry
+from processingVideo import read_batches
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Detector backend benchmark')
+    parser.add_argument('video', help='Video to run the detectors on.')
+    parser.add_argument('--frames', type=int, default=120, help='Number of frames to process.')
+    parser.add_argument('--batch_size', type=int, default=4, help='Frames per detector call.')
+    parser.add_argument('--threads', type=int, default=None, help='CPU inference threads of every backend.')
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx', 'openvino'],
+                        help='Backends to compare.')
+    return parser.parse_args()
+
+
+def load_frames(video, n_frames):
+    cap = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < n_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+class _Frames:
+    """Minimal capture over frames already in memory, so decoding is not part of the timing."""
+
+    def __init__(self, frames):
+        self.frames = iter(frames)
+
+    def read(self):
+        frame = next(self.frames, None)
+        return frame is not None, frame
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    frames = load_frames(args.video, args.frames)
+    print('{:<10} {:<24} {:>10} {:>10}'.format('backend', 'model', 'load (s)', 'fps'))
+
+    for backend in args.backends:
+        for path in (model_registry.VEHICLE_MODEL_PATH, model_registry.LICENSE_PLATE_MODEL_PATH):
+            try:
+                start = time.perf_counter()
+                model = model_registry.load_detector(path, backend=backend, device='cpu', threads=args.threads)
+                load_time = time.perf_counter() - start
+            except Exception as e:
+                print('{:<10} {:<24} skipped: {}'.format(backend, os.path.basename(path), e))
+                continue
+
+            # Warm-up call, not timed
+            list(model(frames[:args.batch_size], stream=True, verbose=False))
+
+            start = time.perf_counter()
+            for batch in read_batches(_Frames(frames), args.batch_size):
+                list(model(batch, stream=True, verbose=False))
+            elapsed = time.perf_counter() - start
+            print('{:<10} {:<24} {:>10.2f} {:>10.1f}'.format(backend, os.path.basename(path), load_time,
+                                                              len(frames) / elapsed))
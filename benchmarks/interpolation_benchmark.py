@@ -0,0 +1,117 @@
+"""
+Scaling benchmark for add_missing_data on synthetic detection CSV rows.
+
+'engine' times the vectorized gap filling (interpolate_tracks) on parsed arrays,
+'rows' times the whole interpolate_bounding_boxes call including bbox parsing and
+formatting the output rows as strings, and 'reference' runs the per-track interp1d
+loop the vectorized code replaced (up to --reference_max rows). tests/test_interpolation.py
+checks that both give exactly the same frames and boxes.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.interpolate import interp1d
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from add_missing_data import interpolate_bounding_boxes, interpolate_tracks, parse_bboxes
+
+
+def synthetic_rows(n_rows, track_length=200, max_gap=5, seed=0):
+    """Builds rows shaped like load_csv output: tracks of track_length detections with random frame gaps."""
+    rng = np.random.RandomState(seed)
+    car_ids = np.arange(n_rows) // track_length + 1
+    gaps = rng.randint(1, max_gap + 1, size=n_rows)
+    gaps[np.arange(n_rows) % track_length == 0] = 0
+    frames = np.cumsum(gaps) - np.cumsum(gaps)[np.arange(n_rows) // track_length * track_length]
+    frames += rng.randint(0, 1000, size=n_rows // track_length + 1)[car_ids - 1]
+    boxes = rng.uniform(0, 2000, size=(n_rows, 8))
+
+    order = np.lexsort((car_ids, frames))  # Same layout as write_csv: frame by frame
+    return [{'frame_nmr': str(frames[i]),
+             'car_id': str(float(car_ids[i])),
+             'car_bbox': '[{} {} {} {}]'.format(*boxes[i, :4]),
+             'license_plate_bbox': '[{} {} {} {}]'.format(*boxes[i, 4:]),
+             'license_plate_bbox_score': '0.5',
+             'license_number': 'AB12CDE',
+             'license_number_score': '0.5',
+             'license_plate_color': 'White'} for i in order]
+
+
+def reference_tracks(frame_numbers, car_ids, car_bboxes, license_plate_bboxes):
+    """The per-track interp1d loop of the original interpolate_bounding_boxes, rows in (car_id, frame) order."""
+    frame_numbers, car_ids = np.asarray(frame_numbers), np.asarray(car_ids)
+    order = np.lexsort((frame_numbers, car_ids))
+    frames, cars, car_bboxes, license_plate_bboxes = (frame_numbers[order], car_ids[order], car_bboxes[order],
+                                                      license_plate_bboxes[order])
+    out_frames, out_cars, out_car_bboxes, out_license_plate_bboxes = [], [], [], []
+    for car_id in np.unique(cars):
+        car_mask = cars == car_id
+        car_frame_numbers = frames[car_mask]
+        car_bboxes_, license_plate_bboxes_ = car_bboxes[car_mask], license_plate_bboxes[car_mask]
+        car_bboxes_interpolated = []
+        license_plate_bboxes_interpolated = []
+        for i in range(len(car_frame_numbers)):
+            frame_number = car_frame_numbers[i]
+            car_bbox = car_bboxes_[i]
+            license_plate_bbox = license_plate_bboxes_[i]
+            if i > 0:
+                prev_frame_number = car_frame_numbers[i - 1]
+                if frame_number - prev_frame_number > 1:
+                    frames_gap = frame_number - prev_frame_number
+                    x = np.array([prev_frame_number, frame_number])
+                    x_new = np.linspace(prev_frame_number, frame_number, num=frames_gap, endpoint=False)
+                    car_interp_func = interp1d(x, np.vstack((car_bboxes_interpolated[-1], car_bbox)), axis=0,
+                                               kind='linear')
+                    license_interp_func = interp1d(x, np.vstack((license_plate_bboxes_interpolated[-1],
+                                                                 license_plate_bbox)), axis=0, kind='linear')
+                    car_bboxes_interpolated.extend(car_interp_func(x_new)[1:])
+                    license_plate_bboxes_interpolated.extend(license_interp_func(x_new)[1:])
+            car_bboxes_interpolated.append(car_bbox)
+            license_plate_bboxes_interpolated.append(license_plate_bbox)
+        out_frames.append(car_frame_numbers[0] + np.arange(len(car_bboxes_interpolated)))
+        out_cars.append(np.full(len(car_bboxes_interpolated), car_id))
+        out_car_bboxes.append(np.array(car_bboxes_interpolated))
+        out_license_plate_bboxes.append(np.array(license_plate_bboxes_interpolated))
+    return {'frame_nmr': np.concatenate(out_frames), 'car_id': np.concatenate(out_cars),
+            'car_bbox': np.concatenate(out_car_bboxes), 'license_plate_bbox': np.concatenate(out_license_plate_bboxes)}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Interpolation scaling benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000, 2000000],
+                        help='Numbers of detection rows to interpolate.')
+    parser.add_argument('--reference_max', type=int, default=100000,
+                        help='Largest size the reference loop is run on.')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    print('{:>10} {:>12} {:>12} {:>10} {:>14}'.format('rows', 'output rows', 'engine (s)', 'rows (s)',
+                                                     'reference (s)'))
+    for n_rows in args.sizes:
+        data = synthetic_rows(n_rows)
+        frame_numbers = [int(row['frame_nmr']) for row in data]
+        car_ids = [int(float(row['car_id'])) for row in data]
+        car_bboxes = parse_bboxes(row['car_bbox'] for row in data)
+        license_plate_bboxes = parse_bboxes(row['license_plate_bbox'] for row in data)
+
+        start = time.perf_counter()
+        tracks = interpolate_tracks(frame_numbers, car_ids, car_bboxes, license_plate_bboxes)
+        engine = time.perf_counter() - start
+
+        start = time.perf_counter()
+        interpolate_bounding_boxes(data)
+        rows = time.perf_counter() - start
+
+        reference_seconds = '-'
+        if n_rows <= args.reference_max:
+            start = time.perf_counter()
+            reference_tracks(frame_numbers, car_ids, car_bboxes, license_plate_bboxes)
+            reference_seconds = '{:.2f}'.format(time.perf_counter() - start)
+        print('{:>10} {:>12} {:>12.3f} {:>10.2f} {:>14}'.format(n_rows, len(tracks['source']), engine, rows,
+                                                               reference_seconds))
@@ -0,0 +1,91 @@
+"""
+Benchmark of plate_grammar.PlateGrammar on random OCR-like reads.
+
+The reads are random strings of 5 to 9 characters, mostly 7, drawn from upper-case
+letters and digits with some lower-case letters, spaces and punctuation. The compiled
+grammar is compared with the previous per-character checks of the UK format
+(license_complies_format, then format_license), which are kept here as a reference;
+tests/test_plate_grammar.py checks that both correct every read the same way.
+"""
+import argparse
+import os
+import string
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from plate_grammar import PlateGrammar, dict_char_to_int, dict_int_to_char
+from benchmarks.timing import best_time
+
+
+def license_complies_format(text):
+    """The UK format check before the grammar."""
+    if len(text) != 7:
+        return False
+
+    if (text[0] in string.ascii_uppercase or text[0] in dict_int_to_char.keys()) and \
+       (text[1] in string.ascii_uppercase or text[1] in dict_int_to_char.keys()) and \
+       (text[2] in ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9'] or text[2] in dict_char_to_int.keys()) and \
+       (text[3] in ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9'] or text[3] in dict_char_to_int.keys()) and \
+       (text[4] in string.ascii_uppercase or text[4] in dict_int_to_char.keys()) and \
+       (text[5] in string.ascii_uppercase or text[5] in dict_int_to_char.keys()) and \
+       (text[6] in string.ascii_uppercase or text[6] in dict_int_to_char.keys()):
+        return True
+    else:
+        return False
+
+
+def format_license(text):
+    """The UK format correction before the grammar."""
+    license_plate_ = ''
+    mapping = {0: dict_int_to_char, 1: dict_int_to_char, 4: dict_int_to_char, 5: dict_int_to_char, 6: dict_int_to_char,
+               2: dict_char_to_int, 3: dict_char_to_int}
+    for j in [0, 1, 2, 3, 4, 5, 6]:
+        if text[j] in mapping[j].keys():
+            license_plate_ += mapping[j][text[j]]
+        else:
+            license_plate_ += text[j]
+
+    return license_plate_
+
+
+def reference_correct(text):
+    """What read_license_plate did with one read: the corrected text, or None if it does not comply."""
+    text = text.upper().replace(' ', '')
+    return format_license(text) if license_complies_format(text) else None
+
+
+def random_reads(n, seed=0):
+    rng = np.random.RandomState(seed)
+    common = np.array(list(string.ascii_uppercase + string.digits))
+    noise = np.array(list(string.ascii_lowercase + ' -.'))
+    lengths = rng.choice([5, 6, 7, 8, 9], size=n, p=[0.05, 0.1, 0.7, 0.1, 0.05])
+    reads = []
+    for length in lengths:
+        chars = rng.choice(common, size=length)
+        noisy = rng.uniform(size=length) < 0.03
+        chars[noisy] = rng.choice(noise, size=noisy.sum())
+        reads.append(''.join(chars))
+    return reads
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Plate grammar benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 200000], help='Numbers of random reads.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size; the best time is reported.')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    grammar = PlateGrammar([('UK', 'AA00AAA')])
+    print('{:>8} {:>8} {:>14} {:>12} {:>8}'.format('reads', 'matches', 'reference (s)', 'grammar (s)', 'speedup'))
+    for n_reads in args.sizes:
+        reads = random_reads(n_reads)
+        _, reference_seconds = best_time(lambda: [reference_correct(text) for text in reads], args.repeat)
+        corrected, grammar_seconds = best_time(lambda: grammar.correct(reads), args.repeat)
+        print('{:>8} {:>8} {:>14.4f} {:>12.4f} {:>7.1f}x'.format(
+            n_reads, sum(text is not None for text in corrected), reference_seconds, grammar_seconds,
+            reference_seconds / grammar_seconds))
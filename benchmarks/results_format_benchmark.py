@@ -0,0 +1,69 @@
+"""
+Load-time benchmark of the results formats on synthetic detection tables.
+
+The same table is written as CSV and as a column directory (results_table); 'csv'
+times reading the CSV with pandas and parsing its bbox strings (what every stage
+did before), 'columns' times opening the column directory (memory-mapped) and
+touching every bbox, and 'interpolate' runs process_interpolation on each format.
+tests/test_results_table.py checks that both formats read back the same values.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from add_missing_data import process_interpolation
+from results_table import ResultsTable, read_results, write_results
+from benchmarks.timing import best_time
+
+
+def synthetic_table(n_rows, cars_per_frame=10, seed=0):
+    """Builds a table shaped like process_input output: cars_per_frame rows per frame."""
+    rng = np.random.RandomState(seed)
+    return ResultsTable({
+        'frame_nmr': np.arange(n_rows) // cars_per_frame,
+        'car_id': np.arange(n_rows) % cars_per_frame + 1,
+        'car_bbox': rng.uniform(0, 2000, size=(n_rows, 4)),
+        'license_plate_bbox': rng.uniform(0, 2000, size=(n_rows, 4)),
+        'license_plate_bbox_score': rng.uniform(size=n_rows),
+        'license_number': np.full(n_rows, 'AB12CDE'),
+        'license_number_score': rng.uniform(size=n_rows),
+        'license_plate_color': np.full(n_rows, 'White'),
+    })
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Results format benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help='Numbers of rows.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size; the best time is reported.')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print('{:>9} {:>9} {:>12} {:>16} {:>20}'.format(
+            'rows', 'csv (s)', 'columns (s)', 'interp. csv (s)', 'interp. columns (s)'))
+        for n_rows in args.sizes:
+            table = synthetic_table(n_rows)
+            csv_path = write_results(table, os.path.join(tmp_dir, 'results.csv'), brackets=True)
+            columns_path = write_results(table, os.path.join(tmp_dir, 'results'))
+
+            _, csv_seconds = best_time(lambda: read_results(csv_path), args.repeat)
+            _, columns_seconds = best_time(lambda: np.asarray(read_results(columns_path)['car_bbox']).sum(),
+                                           args.repeat)
+
+            _, interp_csv = best_time(lambda: process_interpolation(csv_path, os.path.join(tmp_dir, 'out.csv')),
+                                      args.repeat)
+            _, interp_columns = best_time(lambda: process_interpolation(columns_path, os.path.join(tmp_dir, 'out')),
+                                          args.repeat)
+            print('{:>9} {:>9.3f} {:>12.4f} {:>16.3f} {:>20.3f}'.format(
+                n_rows, csv_seconds, columns_seconds, interp_csv, interp_columns))
+    finally:
+        shutil.rmtree(tmp_dir)
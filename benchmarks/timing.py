@@ -0,0 +1,11 @@
+import time
+
+
+def best_time(fn, repeat):
+    """Runs fn repeat times; returns the result of the last run and the best time in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
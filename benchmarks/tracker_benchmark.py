@@ -0,0 +1,75 @@
+"""
+Micro-benchmark of the SORT backends on the MOT sequences bundled in sort/data.
+
+Every sequence is tracked by sort.Sort and sort.vectorized.VectorizedSort; the table
+reports the update() time of each and whether both returned the same tracks.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sort.sort import Sort, KalmanBoxTracker
+from sort.vectorized import VectorizedSort
+
+BACKENDS = [('sort', Sort), ('vectorized', VectorizedSort)]
+
+
+def load_sequence(det_file):
+    """Loads a MOT det.txt file as one (n, 5) [x1, y1, x2, y2, score] array per frame."""
+    seq_dets = np.loadtxt(det_file, delimiter=',')
+    frames = []
+    for frame in range(1, int(seq_dets[:, 0].max()) + 1):
+        dets = seq_dets[seq_dets[:, 0] == frame, 2:7]
+        dets[:, 2:4] += dets[:, 0:2]  # convert [x1, y1, w, h] to [x1, y1, x2, y2]
+        frames.append(dets)
+    return frames
+
+
+def run_tracker(tracker_class, frames, repeat=3):
+    """Tracks a sequence repeat times and returns the tracks of the last run and the best time."""
+    best = float('inf')
+    for _ in range(repeat):
+        KalmanBoxTracker.count = 0
+        tracker = tracker_class()
+        tracks = []
+        start = time.perf_counter()
+        for dets in frames:
+            tracks.append(tracker.update(dets))
+        best = min(best, time.perf_counter() - start)
+    return tracks, best
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='SORT backend benchmark')
+    parser.add_argument('--seq_path', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sort', 'data'),
+                        help='Path to the MOT detections.')
+    parser.add_argument('--phase', default='train', help='Subdirectory in seq_path.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per sequence; the best time is reported.')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    print('{:<16} {:>7} {:>10} {:>12} {:>12} {:>8} {:>6}'.format(
+        'sequence', 'frames', 'dets/frame', 'sort (s)', 'vector. (s)', 'speedup', 'same'))
+    totals = [0.0, 0.0]
+    for det_file in sorted(glob.glob(os.path.join(args.seq_path, args.phase, '*', 'det', 'det.txt'))):
+        seq = det_file.split(os.path.sep)[-3]
+        frames = load_sequence(det_file)
+        (tracks, seconds), (vec_tracks, vec_seconds) = [run_tracker(cls, frames, args.repeat) for _, cls in BACKENDS]
+        same = all(a.shape == b.shape and np.array_equal(a[:, 4], b[:, 4]) and np.allclose(a, b)
+                   for a, b in zip(tracks, vec_tracks))
+        totals[0] += seconds
+        totals[1] += vec_seconds
+        print('{:<16} {:>7} {:>10.1f} {:>12.3f} {:>12.3f} {:>7.1f}x {:>6}'.format(
+            seq, len(frames), sum(len(d) for d in frames) / len(frames), seconds, vec_seconds,
+            seconds / vec_seconds, 'yes' if same else 'NO'))
+    if totals[1] > 0:
+        print('{:<16} {:>7} {:>10} {:>12.3f} {:>12.3f} {:>7.1f}x'.format(
+            'total', '', '', totals[0], totals[1], totals[0] / totals[1]))
@@ -0,0 +1,52 @@
+class FrameStride:
+    """
+    Decides which frames get full detection when processing at a reduced rate.
+
+    Detection runs on every stride-th frame; the tracker only predicts on the frames in
+    between and add_missing_data.interpolate_bounding_boxes fills the gaps afterwards.
+    With adaptive=True the stride is halved whenever a new track appears or the scene
+    holds busy_tracks or more vehicles, and grows by one (up to max_stride) after each
+    detection frame where the set of tracks did not change.
+    """
+
+    def __init__(self, stride=1, adaptive=False, min_stride=1, max_stride=8, busy_tracks=8):
+        self.stride = max(int(stride), 1)
+        self.adaptive = adaptive
+        self.min_stride = max(int(min_stride), 1)
+        self.max_stride = max(int(max_stride), self.min_stride)
+        self.busy_tracks = busy_tracks
+        self.frames = 0
+        self.detected = 0
+        self._since_detection = None
+        self._seen_ids = set()
+        self._last_ids = set()
+
+    def detect_now(self):
+        """Return True if the next frame should run full detection. Call once per frame, in order."""
+        self.frames += 1
+        if self._since_detection is None or self._since_detection + 1 >= self.stride:
+            self._since_detection = 0
+            self.detected += 1
+            return True
+        self._since_detection += 1
+        return False
+
+    def update(self, track_ids):
+        """Adapt the stride to the tracks returned on a detection frame."""
+        ids = {int(track[4]) for track in track_ids}
+        if self.adaptive:
+            if ids - self._seen_ids or len(ids) >= self.busy_tracks:
+                self.stride = max(self.stride // 2, self.min_stride)
+            elif ids == self._last_ids:
+                self.stride = min(self.stride + 1, self.max_stride)
+        self._seen_ids |= ids
+        self._last_ids = ids
+
+    @property
+    def speedup(self):
+        """Estimated detection speedup over running on every frame."""
+        return self.frames / self.detected if self.detected else 1.0
+
+    def report(self):
+        return "Detection ran on {} of {} frames ({:.1f}x fewer than full-rate processing)".format(
+            self.detected, self.frames, self.speedup)
@@ -1,14 +1,26 @@
-import os
+import time
+import uuid
 from flask import Flask, render_template, request, redirect, url_for
 import requests
 
 app = Flask(__name__)
 
-UPLOAD_FOLDER = 'backend/uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
 FASTAPI_URL = "http://localhost:8000/process_video/"
+FASTAPI_JOBS_URL = "http://localhost:8000/jobs/"
+POLL_INTERVAL = 2
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def stream_multipart(field, filename, stream, boundary):
+    """Yield a multipart/form-data body for one file, reading the file in chunks."""
+    yield (f'--{boundary}\r\n'
+           f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+           'Content-Type: application/octet-stream\r\n\r\n').encode()
+    while True:
+        chunk = stream.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+    yield f'\r\n--{boundary}--\r\n'.encode()
 
 @app.route('/')
 def index():
@@ -26,13 +38,25 @@ def upload_video():
     
     if file:
         filename = file.filename.replace(" ", "_")
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        
-        with open(file_path, 'rb') as f:
-            files = {'file': f}
-            response = requests.post(FASTAPI_URL, files=files)
+
+        # Forward the upload to the backend in chunks instead of saving and re-reading it whole
+        boundary = uuid.uuid4().hex
+        response = requests.post(FASTAPI_URL,
+                                 data=stream_multipart('file', filename, file.stream, boundary),
+                                 headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
         
+        if response.status_code != 200:
+            return f"Error processing video: {response.text}", 500
+
+        # Wait for the backend job to finish
+        job_id = response.json()['job_id']
+        while True:
+            status = requests.get(FASTAPI_JOBS_URL + job_id).json()
+            if status['status'] in ('completed', 'failed'):
+                break
+            time.sleep(POLL_INTERVAL)
+
+        response = requests.get(FASTAPI_JOBS_URL + job_id + '/result')
         if response.status_code == 200:
             data = response.json()
             return render_template('results.html', 
@@ -0,0 +1,260 @@
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+
+
+def _init_worker(warm_up, worker_info):
+    """Worker process initializer: optionally load every model before the first job arrives."""
+    if warm_up:
+        import model_registry
+        try:
+            load_times = model_registry.warm_up()
+        except Exception as e:
+            # A failing initializer would break the whole pool; let the jobs report the error instead
+            print(f"Worker {os.getpid()} could not load models: {e}")
+            return
+        worker_info[os.getpid()] = load_times
+        print(f"Worker {os.getpid()} loaded models in " +
+              ", ".join(f"{name}: {seconds:.2f}s" for name, seconds in load_times.items()))
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+def load_cached_result(cache_file, need_video=False):
+    """
+    Return the stored result of an already processed video, or None if it is missing or its outputs are gone.
+
+    With need_video=True a result stored without a rendered video counts as missing too.
+    """
+    if cache_file is None or not os.path.exists(cache_file):
+        return None
+    with open(cache_file) as f:
+        result = json.load(f)
+    if any(path and not os.path.exists(path) for path in (result.get("data"), result.get("processed_video"))):
+        return None
+    if need_video and result.get("data") and not result.get("processed_video"):
+        return None
+    return result
+
+
+def _store_result(cache_file, result):
+    tmp_file = cache_file + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(result, f)
+    os.replace(tmp_file, cache_file)
+
+
+def run_video_pipeline(file_path, output_video_path, persist_dir=None, progress=None, render_options=None):
+    """Run detection, interpolation, rendering and best-plate selection on one video.
+
+    The stages hand results_table.ResultsTable objects to each other in memory, so nothing
+    is written to or read back from disk between them. With persist_dir the detections and
+    the interpolated results are also kept there as column directories (test.results and
+    test_interpolated.results).
+
+    Rendering follows render_options (default: render.RenderOptions.from_env()) and is
+    skipped when output_video_path is None.
+
+    Returns:
+        dict: The 'detections', 'interpolated' and 'plates' (best read and voted plate per car)
+        tables, the plate_aggregator.PlateAggregator as 'aggregator' and the rendered 'video' path
+        (None if not rendered), or None if no license plates were found.
+    """
+    from processingVideo import process_input
+    from add_missing_data import interpolate_results
+    from visualize import scale_best_crops, video_output
+    from plate_aggregator import PlateAggregator
+    from results_table import write_results
+
+    detections_path = None
+    if persist_dir is not None:
+        os.makedirs(persist_dir, exist_ok=True)
+        detections_path = os.path.join(persist_dir, "test.results").replace("\\", "/")
+
+    # Step 1: Process video frames; every track's plate is voted as its reads come in
+    aggregator = PlateAggregator()
+    detections = process_input(file_path, output_csv=detections_path, progress=progress, table=True,
+                               aggregator=aggregator)
+    if not len(detections):
+        return None
+
+    # Step 2: Fill in the frames with missing data
+    interpolated = interpolate_results(detections)
+    if persist_dir is not None:
+        write_results(interpolated, os.path.join(persist_dir, "test_interpolated.results").replace("\\", "/"))
+
+    # Step 3: Generate video output with detected plates and interpolated data
+    video = video_output(file_path, output_video_path, interpolated, scale_best_crops(aggregator.best_crops()),
+                         options=render_options)
+
+    # Step 4: The best read and voted plate of every car, already known from the aggregator
+    return {"detections": detections, "interpolated": interpolated, "plates": aggregator.table(),
+            "aggregator": aggregator, "video": video}
+
+
+def run_video_job(job_id, file_path, output_video_path, job_dir, progress, cache_file=None, persist=False,
+                  render=True):
+    """Run the whole pipeline for one uploaded video inside a worker process.
+
+    Only the best plate of every car is written to disk (job_dir/final_csv.csv); the result
+    also lists them as "plates", with the voted text, vote confidence and best read of each car. With persist=True the intermediate results are kept
+    in job_dir too (see run_video_pipeline). With render=False no video is rendered and
+    "processed_video" is None.
+
+    With cache_file the result is also stored there, so a later upload of the same
+    video can be answered without running the pipeline again.
+    """
+    from results_table import write_results
+
+    os.makedirs(job_dir, exist_ok=True)
+    output_final_file = os.path.join(job_dir, "final_csv.csv").replace("\\", "/")
+
+    def report(frames_done, frames_total):
+        progress[job_id] = (frames_done, frames_total)
+
+    tables = run_video_pipeline(file_path, output_video_path if render else None, job_dir if persist else None,
+                                report)
+    if tables is None:
+        result = {"message": "No license plates found", "data": None, "plates": [], "processed_video": None}
+        if cache_file is not None:
+            _store_result(cache_file, result)
+        return result
+
+    res = write_results(tables["plates"], output_final_file)
+
+    result = {"message": "Processing completed", "data": res, "plates": tables["aggregator"].plates(),
+              "processed_video": tables["video"]}
+    if cache_file is not None:
+        _store_result(cache_file, result)
+    return result
+
+
+class JobQueue:
+    """
+    Runs video processing jobs on a pool of worker processes and tracks their state.
+
+    Jobs are identified by a random hex id. The workers report frames done / total
+    through a shared dict, so status() can be polled while a job runs. Each worker keeps
+    its models loaded across jobs (see model_registry); with warm_up=True every worker is
+    started and loads them right away, and their load times are kept in worker_info.
+
+    Jobs can carry the SHA-256 of their video. With a cache_dir, finished results are
+    stored per hash and cached() answers repeat uploads; a video that is already being
+    processed is not queued twice.
+    """
+
+    def __init__(self, max_workers=1, warm_up=False, cache_dir=None):
+        context = multiprocessing.get_context("spawn")
+        self.max_workers = max_workers
+        self.manager = context.Manager()
+        self.progress = self.manager.dict()
+        self.worker_info = self.manager.dict()
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                            initializer=_init_worker, initargs=(warm_up, self.worker_info))
+        self.jobs = {}
+        self.active_hashes = {}
+        self.cache_dir = cache_dir
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        if warm_up:
+            # Workers are started on demand; submitting one task per worker starts them all now
+            for _ in range(max_workers):
+                self.executor.submit(_worker_ready)
+
+    @staticmethod
+    def new_job_id():
+        return uuid.uuid4().hex
+
+    def _cache_file(self, content_hash):
+        if self.cache_dir is None or content_hash is None:
+            return None
+        return os.path.join(self.cache_dir, content_hash + ".json")
+
+    def cached(self, job_id, content_hash, render=True):
+        """
+        Register job_id as an already completed job if a video with this hash was processed before.
+
+        With render=True only results that include a rendered video count.
+
+        Returns:
+            dict: The stored result, or None on a cache miss.
+        """
+        result = load_cached_result(self._cache_file(content_hash), need_video=render)
+        if result is not None:
+            future = Future()
+            future.set_result(result)
+            self.jobs[job_id] = {"future": future, "submitted": time.time(), "file_path": None, "cached": True}
+        return result
+
+    def submit(self, job_id, file_path, output_video_path, job_dir, content_hash=None, persist=False, render=True):
+        """
+        Queue a video for processing and return its job id.
+
+        With persist=True the job also keeps its intermediate results in job_dir; with
+        render=False it only returns the plate data, without rendering a video.
+
+        If a job for the same content_hash is still queued or running, its id is returned
+        instead and nothing new is queued.
+        """
+        active = self.active_hashes.get(content_hash)
+        if (active is not None and not self.jobs[active]["future"].done() and
+                (self.jobs[active].get("render", True) or not render)):
+            return active
+
+        self.progress[job_id] = (0, 0)
+        future = self.executor.submit(run_video_job, job_id, file_path, output_video_path, job_dir, self.progress,
+                                      self._cache_file(content_hash), persist, render)
+        self.jobs[job_id] = {"future": future, "submitted": time.time(), "file_path": file_path, "render": render}
+        if content_hash is not None:
+            self.active_hashes[content_hash] = job_id
+        return job_id
+
+    def status(self, job_id):
+        """
+        Return the state of a job, or None if the id is unknown.
+
+        Returns:
+            dict: job_id, status (queued, running, completed or failed), frames_done, frames_total and,
+            once failed, the error message.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job["future"]
+        frames_done, frames_total = self.progress.get(job_id, (0, 0))
+        status = {"job_id": job_id, "frames_done": frames_done, "frames_total": frames_total,
+                  "cached": job.get("cached", False)}
+
+        if future.done():
+            error = future.exception()
+            if error is None:
+                status["status"] = "completed"
+            else:
+                status["status"] = "failed"
+                status["error"] = str(error)
+        elif future.running() or frames_done > 0:
+            status["status"] = "running"
+        else:
+            status["status"] = "queued"
+        return status
+
+    def result(self, job_id):
+        """Return the result dict of a completed job, or None if it has not completed."""
+        job = self.jobs.get(job_id)
+        if job is None or not job["future"].done() or job["future"].exception() is not None:
+            return None
+        return job["future"].result()
+
+    def model_load_times(self):
+        """Return the model load times reported by each warmed-up worker, keyed by process id."""
+        return dict(self.worker_info)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.manager.shutdown()
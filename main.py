@@ -1,13 +1,11 @@
+import hashlib
 import os
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from pathlib import Path
 
-from processingVideo import process_input
-from add_missing_data import process_interpolation
-from visualize import video_output
-from processCsv import final_csv
+from jobs import JobQueue
 
 app = FastAPI()
 
@@ -31,6 +29,43 @@ Path(RESULTS_FOLDER).mkdir(parents=True, exist_ok=True)
 
 final_output_csv = os.path.join(OUTPUT_FOLDER, "final_csv.csv").replace("\\", "/")
 
+# Uploads are written in chunks of this size so memory stays flat for large videos
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Results of processed videos, keyed by the SHA-256 of the video content
+CACHE_FOLDER = os.path.join(OUTPUT_FOLDER, "cache")
+
+# Videos are processed by a pool of worker processes; set VNPR_WORKERS to run several at once.
+# Each worker loads the models once; VNPR_WARMUP=0 defers loading to the first job.
+job_queue = None
+
+@app.on_event("startup")
+def start_job_queue():
+    global job_queue
+    job_queue = JobQueue(max_workers=int(os.environ.get("VNPR_WORKERS", "1")),
+                         warm_up=os.environ.get("VNPR_WARMUP", "1") == "1",
+                         cache_dir=CACHE_FOLDER)
+
+@app.on_event("shutdown")
+def shutdown_job_queue():
+    job_queue.shutdown()
+
+@app.get("/models/")
+async def model_status():
+    # Model load time of each warmed-up worker process
+    return {"workers": job_queue.model_load_times()}
+
+async def save_upload(file: UploadFile, file_path: str) -> str:
+    """Stream an upload to disk in chunks and return the SHA-256 of its content."""
+    content_hash = hashlib.sha256()
+    with open(file_path, "wb") as buffer:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            content_hash.update(chunk)
+            buffer.write(chunk)
+    return content_hash.hexdigest()
+
 @app.post("/upload_video/")
 async def upload_video(file: UploadFile = File(...)):
     # Ensure the filename is safe
@@ -38,45 +73,69 @@ async def upload_video(file: UploadFile = File(...)):
     file_path = os.path.join(UPLOAD_FOLDER, filename)
 
     # Save the uploaded video file
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    content_hash = await save_upload(file, file_path)
     
     file_path = file_path.replace("\\", "/")
 
-    return {"message": "Video uploaded successfully!", "file_path": file_path}
+    return {"message": "Video uploaded successfully!", "file_path": file_path, "sha256": content_hash}
 
 @app.post("/process_video/")
-async def process_uploaded_video(file: UploadFile = File(...)):
+async def process_uploaded_video(file: UploadFile = File(...), persist: bool = False, render: bool = True):
     # Ensure the filename is safe
     filename = file.filename.replace(" ", "_")
-    file_path = os.path.join(UPLOAD_FOLDER, filename).replace("\\", "/")
-    output_video_path = os.path.join(RESULTS_FOLDER, filename).replace("\\", "/")
-    output_test_file = os.path.join(OUTPUT_FOLDER, "test.csv").replace("\\", "/")
-    output_interpolated_file = os.path.join(OUTPUT_FOLDER, "test_interpolated.csv").replace("\\", "/")
-    
+    job_id = JobQueue.new_job_id()
+    file_path = os.path.join(UPLOAD_FOLDER, f"{job_id}_{filename}").replace("\\", "/")
+    output_video_path = os.path.join(RESULTS_FOLDER, f"{job_id}_{filename}").replace("\\", "/")
+    job_dir = os.path.join(OUTPUT_FOLDER, "jobs", job_id).replace("\\", "/")
 
     # Save the uploaded video file
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    content_hash = await save_upload(file, file_path)
+
+    # The same video was processed before: answer from the cache without any inference
+    cached = job_queue.cached(job_id, content_hash, render)
+    if cached is not None:
+        os.remove(file_path)
+        return {
+            **cached,
+            "job_id": job_id,
+            "cached": True,
+            "status_url": f"/jobs/{job_id}",
+            "result_url": f"/jobs/{job_id}/result"
+        }
+
+    # Detection, interpolation, rendering and the final csv run in a worker process, passing their
+    # results in memory; with ?persist=true the intermediate results are also kept in job_dir,
+    # with ?render=false no video is rendered and only the plate data is returned
+    queued_id = job_queue.submit(job_id, file_path, output_video_path, job_dir, content_hash, persist, render)
+    if queued_id != job_id:
+        # Already being processed
+        os.remove(file_path)
+        job_id = queued_id
 
-    # Step 1: Process video frames
-    results = process_input(file_path, output_csv=output_test_file)
-    
-    # Step 2: Process video frames for missing data
-    process_interpolation(results, output_csv=output_interpolated_file)
-    
-    # Step 3: Generate video output with detected plates and interpolated data
-    
-    video_output(file_path, output_video_path, output_interpolated_file)
-    
-    # Step 4: Generate final csv with interpolated data
-    res = final_csv(output_interpolated_file)
-    
     return {
-        "message": "Processing completed", 
-        "data": res, 
-        "processed_video": output_video_path
+        "message": "Processing started",
+        "job_id": job_id,
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result"
     }
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    status = job_queue.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return status
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    status = job_queue.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if status["status"] == "failed":
+        raise HTTPException(status_code=500, detail=status["error"])
+    if status["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}")
+    return job_queue.result(job_id)
     
 
 if __name__ == "__main__":
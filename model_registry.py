@@ -0,0 +1,164 @@
+import glob
+import os
+import threading
+import time
+
+from sort.sort import Sort
+from sort.vectorized import VectorizedSort
+
+VEHICLE_MODEL_PATH = 'models/yolov8n.pt'
+LICENSE_PLATE_MODEL_PATH = 'models/license_plate_detector.pt'
+
+# Inference settings, read from the environment:
+#   VNPR_DEVICE   cuda, cpu, ... (default: cuda when available, otherwise cpu)
+#   VNPR_BACKEND  torch, onnx or openvino (default: torch)
+#   VNPR_THREADS  CPU inference threads of torch, onnxruntime and OpenVINO (default: library default)
+#   VNPR_TRACKER  sort or vectorized SORT backend (default: sort)
+DEVICE = os.environ.get('VNPR_DEVICE') or None
+BACKEND = os.environ.get('VNPR_BACKEND', 'torch')
+THREADS = int(os.environ.get('VNPR_THREADS', '0')) or None
+TRACKER = os.environ.get('VNPR_TRACKER', 'sort')
+
+EXPORT_SUFFIXES = {'onnx': '.onnx', 'openvino': '_openvino_model'}
+
+_models = {}
+_load_times = {}
+_lock = threading.Lock()
+
+
+def _get(name, load):
+    """Return a model from the registry, loading it on first use."""
+    model = _models.get(name)
+    if model is None:
+        with _lock:
+            model = _models.get(name)
+            if model is None:
+                start = time.perf_counter()
+                model = load()
+                _load_times[name] = time.perf_counter() - start
+                _models[name] = model
+    return model
+
+
+def get_device():
+    """Return the configured inference device, falling back to cpu when CUDA is not available."""
+    if DEVICE:
+        return DEVICE
+    import torch
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+
+def set_threads(threads):
+    """Limit the CPU threads used by torch, and by OpenMP-based runtimes loaded after this call."""
+    if not threads:
+        return
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+
+
+def export_detector(path, backend):
+    """
+    Export a YOLO .pt model to ONNX or OpenVINO, reusing a previous export when it is newer than the weights.
+
+    Returns:
+        str: Path of the exported model (an .onnx file or an OpenVINO model directory).
+    """
+    exported = os.path.splitext(path)[0] + EXPORT_SUFFIXES[backend]
+    if os.path.exists(exported) and os.path.getmtime(exported) >= os.path.getmtime(path):
+        return exported
+
+    from ultralytics import YOLO
+    # Dynamic axes so a whole batch of frames (or ROI crops) goes through in one call
+    exported = YOLO(path).export(format=backend, dynamic=True)
+    return str(exported)
+
+
+def limit_export_threads(model, exported, backend, threads):
+    """
+    Run an exported YOLO model with at most threads CPU inference threads.
+
+    ultralytics builds the onnxruntime session without session options and compiles the
+    OpenVINO model with its default config, so neither sees set_threads(). Once ultralytics
+    has set the model up (on the first prediction) its session is replaced by one created with
+    intra_op_num_threads (onnx) or INFERENCE_NUM_THREADS (openvino).
+    """
+    def on_predict_start(predictor):
+        runtime = predictor.model
+        if getattr(runtime, 'threads', None) == threads:
+            return
+        if backend == 'onnx':
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads
+            runtime.session = onnxruntime.InferenceSession(exported, options,
+                                                           providers=runtime.session.get_providers())
+        else:
+            from openvino.runtime import Core
+            core = Core()
+            xml = exported if exported.endswith('.xml') else glob.glob(os.path.join(exported, '*.xml'))[0]
+            runtime.executable_network = core.compile_model(core.read_model(xml), 'CPU',
+                                                            {'INFERENCE_NUM_THREADS': threads})
+        runtime.threads = threads
+
+    model.add_callback('on_predict_start', on_predict_start)
+    return model
+
+
+def load_detector(path, backend=None, device=None, threads=None):
+    """Load a YOLO detector with the given (or configured) backend, device and CPU thread limit."""
+    from ultralytics import YOLO
+    backend = backend or BACKEND
+    threads = threads or THREADS
+    set_threads(threads)
+    if backend == 'torch':
+        return YOLO(path).to(device or get_device())
+    if backend not in EXPORT_SUFFIXES:
+        raise ValueError(f"Unknown inference backend '{backend}', expected torch, onnx or openvino")
+    exported = export_detector(path, backend)
+    model = YOLO(exported, task='detect')
+    if threads:
+        limit_export_threads(model, exported, backend, threads)
+    return model
+
+
+def _load_ocr_reader():
+    import easyocr
+    return easyocr.Reader(['en'], gpu=get_device().startswith('cuda'))
+
+
+def get_vehicle_detector():
+    """Return the YOLOv8 COCO vehicle detector, loaded once per process."""
+    return _get('vehicle_detector', lambda: load_detector(VEHICLE_MODEL_PATH))
+
+
+def get_license_plate_detector():
+    """Return the license plate detector, loaded once per process."""
+    return _get('license_plate_detector', lambda: load_detector(LICENSE_PLATE_MODEL_PATH))
+
+
+def get_ocr_reader():
+    """Return the EasyOCR reader, built once per process."""
+    return _get('ocr_reader', _load_ocr_reader)
+
+
+def new_tracker():
+    """Return a fresh SORT tracker; trackers hold per-video state and are never shared."""
+    if TRACKER == 'vectorized':
+        return VectorizedSort()
+    if TRACKER != 'sort':
+        raise ValueError(f"Unknown tracker backend '{TRACKER}', expected sort or vectorized")
+    return Sort()
+
+
+def load_times():
+    """Return the seconds spent loading each model loaded so far in this process."""
+    return dict(_load_times)
+
+
+def warm_up():
+    """Load every model now instead of on the first request and return the load times."""
+    get_vehicle_detector()
+    get_license_plate_detector()
+    get_ocr_reader()
+    return load_times()
@@ -0,0 +1,97 @@
+def _area(plate_bbox):
+    x1, y1, x2, y2 = plate_bbox[:4]
+    return max(x2 - x1, 0) * max(y2 - y1, 0)
+
+
+class OcrScheduler:
+    """
+    Decides, per SORT track, whether a plate crop needs another OCR read.
+
+    Only the highest-scoring read per car_id survives final_csv, so once a track has
+    given confirm_reads consistent reads scoring at least min_score it is not read
+    again. Otherwise a track is re-read every recheck_interval frames, or earlier when
+    its plate box grows by more than growth (the car is getting closer, the crop sharper).
+    In between, the best read so far is reused. Tracks are evicted as soon as SORT drops them.
+    """
+
+    def __init__(self, confirm_reads=3, min_score=0.5, recheck_interval=10, growth=1.3):
+        self.confirm_reads = confirm_reads
+        self.min_score = min_score
+        self.recheck_interval = recheck_interval
+        self.growth = growth
+        self.tracks = {}
+        self.frame = -1
+        self.reads = 0
+        self.skipped = 0
+
+    def advance(self, live_ids=None):
+        """Move to the next frame and evict tracks that are no longer in live_ids."""
+        self.frame += 1
+        if live_ids is not None:
+            live_ids = {int(car_id) for car_id in live_ids}
+            for car_id in [car_id for car_id in self.tracks if car_id not in live_ids]:
+                del self.tracks[car_id]
+
+    def schedule(self, car_id, plate_bbox):
+        """
+        Return True if the plate of this track should be read on the current frame.
+
+        Args:
+            car_id (float): SORT track id.
+            plate_bbox (list): License plate box (x1, y1, x2, y2).
+
+        Returns:
+            bool: True to run OCR, False to reuse the cached read.
+        """
+        car_id = int(car_id)
+        area = _area(plate_bbox)
+        track = self.tracks.get(car_id)
+
+        if track is None:
+            track = {'best': None, 'last_text': None, 'streak': 0, 'confirmed': False}
+            self.tracks[car_id] = track
+        elif self._skips(track, area, self.frame):
+            self.skipped += 1
+            return False
+
+        track['last_frame'] = self.frame
+        track['last_area'] = area
+        self.reads += 1
+        return True
+
+    def _skips(self, track, area, frame):
+        return track['confirmed'] or (frame - track['last_frame'] < self.recheck_interval and
+                                      area <= track['last_area'] * self.growth)
+
+    def will_skip(self, car_id, plate_bbox, frames_ahead=1):
+        """
+        Guess, without changing any state, whether schedule() will skip this plate frames_ahead
+        frames from now, e.g. to avoid work for crops that will not be read. Reads recorded in
+        the meantime can change the answer.
+        """
+        track = self.tracks.get(int(car_id))
+        return track is not None and self._skips(track, _area(plate_bbox), self.frame + frames_ahead)
+
+    def record(self, car_id, text, score, color):
+        """
+        Store the result of an OCR read scheduled for this track. A failed (text None) or
+        low-scoring read breaks the streak of consistent reads, so confirmed reads are consecutive.
+        """
+        track = self.tracks.get(int(car_id))
+        if track is None:
+            return
+        if text is None or score < self.min_score:
+            track['streak'] = 0
+            track['last_text'] = None
+        else:
+            track['streak'] = track['streak'] + 1 if text == track['last_text'] else 1
+            track['last_text'] = text
+            track['confirmed'] = track['streak'] >= self.confirm_reads
+
+        if text is not None and (track['best'] is None or score > track['best'][1]):
+            track['best'] = (text, score, color)
+
+    def cached(self, car_id):
+        """Return the best (text, score, color) read so far for a track, or None."""
+        track = self.tracks.get(int(car_id))
+        return track['best'] if track is not None else None
@@ -0,0 +1,246 @@
+import string
+
+import numpy as np
+
+from results_table import ResultsTable, frame_rows
+
+# Characters that take part in the vote; any other character of a read is ignored
+ALPHABET = string.ascii_uppercase + string.digits
+
+_CHAR_INDEX = np.full(256, -1, dtype=np.int64)
+for _i, _char in enumerate(ALPHABET):
+    _CHAR_INDEX[ord(_char)] = _i
+
+
+def vote(votes):
+    """
+    Pick the plate text of a character-position vote.
+
+    Args:
+        votes (dict): Plate length -> (length, len(ALPHABET)) array of summed read scores.
+
+    Returns:
+        tuple: (text, confidence), the winning character of every position of the length with
+        the highest total score and the mean share of the score its characters won; (None, 0.0)
+        if there are no votes.
+    """
+    if not votes:
+        return None, 0.0
+    length, counts = max(votes.items(), key=lambda item: item[1].sum())
+    winners = counts.argmax(axis=1)
+    totals = counts.sum(axis=1)
+    text = ''.join(ALPHABET[i] if total > 0 else '?' for i, total in zip(winners.tolist(), totals.tolist()))
+    shares = counts[np.arange(length), winners] / np.maximum(totals, np.finfo(float).tiny)
+    return text, float(shares.mean())
+
+
+class PlateAggregator:
+    """
+    Aggregates the plate reads of every track while the frames are processed.
+
+    Per car_id it keeps a character-position vote (for each plate length read, a small array of
+    the summed OCR scores of every character at every position) and its best-scoring read: the
+    frame, boxes, text, score and color, plus a copy of the plate crop when the results carry
+    one, so the renderer does not have to find it in the video again. Only fresh OCR reads
+    vote; reads the OcrScheduler reused ('cached' in the results) do not. A track ends once it has
+    had no read for end_after frames, or at close(); its final plate is then in finished and
+    passed to on_final(plate), so it is known as soon as the car has gone instead of after a
+    pass over all the results. A car_id read again after its track ended resumes the track, and
+    on_final gets the updated plate when it ends again. The vote state of an ended track is only
+    kept for forget_after frames (None: for the whole run); after that just its final plate and
+    crop remain, and a later read of the car_id starts a new vote from that plate's best read.
+
+    Same write/write_frame/flush/close interface as util.ResultsSink, so process_input can feed it.
+    """
+
+    def __init__(self, end_after=30, on_final=None, forget_after=300):
+        self.end_after = end_after
+        self.forget_after = forget_after
+        self.on_final = on_final
+        self.tracks = {}
+        self.finished = {}
+        self.ended = {}
+        self.crops = {}
+
+    def write(self, frame_nmr, car_id, car_bbox, license_plate_bbox, bbox_score, text, text_score, color,
+              vote=True):
+        """
+        Add one read of a track; returns True if it became the track's best read. With vote=False
+        (e.g. a read the OcrScheduler reused from an earlier frame) it does not count in the vote.
+        """
+        car_id = int(car_id)
+        track = self.tracks.get(car_id)
+        if track is None:
+            track = self.ended.pop(car_id, None)
+            final = self.finished.pop(car_id, None)
+            if track is None and final is not None:
+                track = {'votes': {}, 'best': final['best'], 'reads': final['reads'],
+                         'first_frame': final['first_frame']}
+            elif track is None:
+                track = {'votes': {}, 'best': None, 'reads': 0, 'first_frame': frame_nmr}
+            self.tracks[car_id] = track
+        track['last_frame'] = frame_nmr
+        track['reads'] += 1
+
+        score = float(text_score)
+        improved = track['best'] is None or score > track['best']['license_number_score']
+        if improved:
+            track['best'] = {'frame_nmr': int(frame_nmr),
+                             'car_bbox': [float(v) for v in car_bbox[:4]],
+                             'license_plate_bbox': [float(v) for v in license_plate_bbox[:4]],
+                             'license_plate_bbox_score': float(bbox_score),
+                             'license_number': str(text),
+                             'license_number_score': score,
+                             'license_plate_color': str(color)}
+
+        if vote and score > 0 and text:
+            codes = _CHAR_INDEX[np.frombuffer(str(text).encode('ascii', 'replace'), dtype=np.uint8)]
+            votes = track['votes'].get(len(codes))
+            if votes is None:
+                votes = track['votes'][len(codes)] = np.zeros((len(codes), len(ALPHABET)))
+            known = codes >= 0
+            votes[np.flatnonzero(known), codes[known]] += score
+        return improved
+
+    def write_frame(self, frame_nmr, frame_results):
+        """Add the reads of one frame, given as the {car_id: {'car': ..., 'license_plate': ...}} dict."""
+        for row in frame_rows(frame_results):
+            plate = frame_results[row[0]]['license_plate']
+            if self.write(frame_nmr, *row, vote=not plate.get('cached', False)):
+                crop = plate.get('crop')
+                if crop is not None:
+                    self.crops[int(row[0])] = crop.copy()
+        self.end_tracks(frame_nmr - self.end_after)
+        if self.forget_after is not None:
+            self.forget_tracks(frame_nmr - self.forget_after)
+
+    def end_tracks(self, before_frame=None):
+        """End the tracks whose last read is older than before_frame (every track if None)."""
+        ended = [car_id for car_id, track in self.tracks.items()
+                 if before_frame is None or track['last_frame'] < before_frame]
+        for car_id in ended:
+            track = self.ended[car_id] = self.tracks.pop(car_id)
+            plate = self._plate(car_id, track)
+            self.finished[car_id] = plate
+            if self.on_final is not None:
+                self.on_final(plate)
+
+    def forget_tracks(self, before_frame):
+        """Drop the vote state of the ended tracks whose last read is older than before_frame."""
+        # Tracks are added to ended in the order they end, so the oldest come first
+        while self.ended:
+            car_id, track = next(iter(self.ended.items()))
+            if track['last_frame'] >= before_frame:
+                break
+            del self.ended[car_id]
+
+    def _plate(self, car_id, track):
+        text, confidence = vote(track['votes'])
+        return {'car_id': car_id,
+                'license_number': text if text is not None else track['best']['license_number'],
+                'vote_confidence': confidence,
+                'reads': track['reads'],
+                'first_frame': int(track['first_frame']),
+                'last_frame': int(track['last_frame']),
+                'best': track['best']}
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.end_tracks()
+
+    def plate(self, car_id):
+        """The final plate of a track, or its current state if it has not ended; None for an unknown car_id."""
+        car_id = int(car_id)
+        if car_id in self.finished:
+            return self.finished[car_id]
+        track = self.tracks.get(car_id)
+        return self._plate(car_id, track) if track is not None else None
+
+    def plates(self):
+        """Every track's plate (final or current), sorted by car_id."""
+        return [self.plate(car_id) for car_id in sorted(self.finished.keys() | self.tracks.keys())]
+
+    def best_crops(self):
+        """
+        The unscaled plate crop of every car's best read, with its plate box and voted text
+        ({car_id: {'crop', 'bbox', 'license_plate_number'}}, see visualize.scale_best_crops).
+        Cars without a kept crop (e.g. after from_table) are left out.
+        """
+        return {plate['car_id']: {'crop': self.crops[plate['car_id']],
+                                  'bbox': plate['best']['license_plate_bbox'],
+                                  'license_plate_number': plate['license_number']}
+                for plate in self.plates() if plate['car_id'] in self.crops}
+
+    def table(self):
+        """One row per car: its best read, with the voted plate text as license_number."""
+        plates = self.plates()
+        if not plates:
+            return ResultsTable.empty()
+        best = [plate['best'] for plate in plates]
+        return ResultsTable({
+            'frame_nmr': [read['frame_nmr'] for read in best],
+            'car_id': [plate['car_id'] for plate in plates],
+            'car_bbox': np.array([read['car_bbox'] for read in best]),
+            'license_plate_bbox': np.array([read['license_plate_bbox'] for read in best]),
+            'license_plate_bbox_score': [read['license_plate_bbox_score'] for read in best],
+            'license_number': [plate['license_number'] for plate in plates],
+            'license_number_score': [read['license_number_score'] for read in best],
+            'license_plate_color': [read['license_plate_color'] for read in best],
+        })
+
+    @classmethod
+    def from_table(cls, table, **kwargs):
+        """
+        Aggregate the rows of a finished ResultsTable at once, with the same result as writing
+        them frame by frame and closing; rows with score 0 (e.g. interpolated) do not vote.
+        A table does not record which reads the OcrScheduler reused, so every scored row votes;
+        pass the aggregator to process_input to vote on fresh reads only.
+        """
+        aggregator = cls(**kwargs)
+        if not len(table):
+            return aggregator
+        order = np.argsort(table['frame_nmr'], kind='stable')
+        table = table.take(order)
+        car_ids, car_index = np.unique(table['car_id'], return_inverse=True)
+        frame_nmr = table['frame_nmr']
+        score = table['license_number_score']
+
+        # Votes of every (car, plate length) group, summed in one (groups, width, alphabet) array
+        texts = np.asarray(table['license_number'])
+        codes = np.ascontiguousarray(texts).view(np.uint32).reshape(len(texts), -1).astype(np.int64)
+        codes = np.where(codes < 256, _CHAR_INDEX[np.minimum(codes, 255)], -1)
+        lengths = np.char.str_len(texts)
+        voting = np.flatnonzero((score > 0) & (lengths > 0))
+        keys, group_index = np.unique(car_index[voting] * (codes.shape[1] + 1) + lengths[voting], return_inverse=True)
+        groups = np.stack(np.divmod(keys, codes.shape[1] + 1), axis=1)
+        counts = np.zeros((len(groups), codes.shape[1], len(ALPHABET)))
+        rows, positions = np.nonzero((codes[voting] >= 0) & (np.arange(codes.shape[1]) < lengths[voting][:, None]))
+        np.add.at(counts, (group_index[rows], positions, codes[voting][rows, positions]), score[voting][rows])
+
+        first_group = np.searchsorted(groups[:, 0], np.arange(len(car_ids) + 1))  # Groups are sorted by car
+        best = table.best_rows()
+        reads = np.bincount(car_index)
+        first_frame = np.full(len(car_ids), np.iinfo(np.int64).max)
+        np.minimum.at(first_frame, car_index, frame_nmr)
+        last_frame = np.full(len(car_ids), np.iinfo(np.int64).min)
+        np.maximum.at(last_frame, car_index, frame_nmr)
+
+        for i, car_id in enumerate(car_ids.tolist()):
+            j = best[i]
+            aggregator.tracks[car_id] = {
+                'votes': {int(groups[g, 1]): counts[g, :groups[g, 1]]
+                          for g in range(first_group[i], first_group[i + 1])},
+                'best': {'frame_nmr': int(frame_nmr[j]),
+                         'car_bbox': table['car_bbox'][j].tolist(),
+                         'license_plate_bbox': table['license_plate_bbox'][j].tolist(),
+                         'license_plate_bbox_score': float(table['license_plate_bbox_score'][j]),
+                         'license_number': str(texts[j]),
+                         'license_number_score': float(score[j]),
+                         'license_plate_color': str(table['license_plate_color'][j])},
+                'reads': int(reads[i]),
+                'first_frame': int(first_frame[i]),
+                'last_frame': int(last_frame[i])}
+        aggregator.close()
+        return aggregator
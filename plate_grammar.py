@@ -0,0 +1,135 @@
+import string
+
+import numpy as np
+
+# Characters OCR confuses, mapped to what they most likely are at a position that needs
+# a digit (dict_char_to_int) or a letter (dict_int_to_char)
+dict_char_to_int = {'O': '0',
+                    'I': '1',
+                    'J': '3',
+                    'A': '4',
+                    'G': '6',
+                    'S': '5'}
+
+dict_int_to_char = {'0': 'O',
+                    '1': 'I',
+                    '3': 'J',
+                    '4': 'A',
+                    '6': 'G',
+                    '5': 'S'}
+
+# Plate formats tried in order, as (region, template). In a template 'A' is a letter,
+# '0' a digit, '*' a letter or a digit, '[...]' one of the listed characters and any
+# other character must appear as it is.
+PLATE_FORMATS = [('UK', 'AA00AAA')]
+
+_CLASSES = {'A': string.ascii_uppercase,
+            '0': string.digits,
+            '*': string.ascii_uppercase + string.digits}
+
+
+def parse_template(template):
+    """
+    Split a plate template into the set of allowed characters of each position.
+
+    Returns:
+        list: One string of allowed characters per position.
+    """
+    positions = []
+    i = 0
+    while i < len(template):
+        if template[i] == '[':
+            end = template.index(']', i)
+            positions.append(template[i + 1:end])
+            i = end + 1
+        else:
+            positions.append(_CLASSES.get(template[i], template[i]))
+            i += 1
+    return positions
+
+
+def _position_table(allowed):
+    """Byte lookup table of one position: the character it reads as, or 0 if it cannot appear there."""
+    table = np.zeros(256, dtype=np.uint8)
+    for char, mapped in list(dict_char_to_int.items()) + list(dict_int_to_char.items()):
+        if mapped in allowed:
+            table[ord(char)] = ord(mapped)
+    for char in allowed:
+        table[ord(char)] = ord(char)
+    return table
+
+
+class PlateGrammar:
+    """
+    Validates and corrects OCR reads against a list of plate formats.
+
+    Every template is compiled once into a (length, 256) table mapping each byte at each
+    position to its corrected character (0 if it is not allowed there), so checking a whole
+    list of candidates is a table lookup per format instead of per-character Python tests.
+    Adding a format adds one table; candidates are only checked against formats of their length.
+    """
+
+    def __init__(self, formats=None):
+        self.formats = list(PLATE_FORMATS if formats is None else formats)
+        self.tables = {}
+        for region, template in self.formats:
+            positions = parse_template(template)
+            table = np.stack([_position_table(allowed) for allowed in positions])
+            self.tables.setdefault(len(positions), []).append((region, table))
+
+    def match(self, texts):
+        """
+        Correct a list of candidate texts in one call.
+
+        The texts are upper-cased and spaces are removed, as EasyOCR reads them.
+
+        Returns:
+            list: One (corrected_text, region) tuple per text, (None, None) where no format matches.
+        """
+        results = [(None, None)] * len(texts)
+        by_length = {}
+        for i, text in enumerate(texts):
+            text = text.upper().replace(' ', '')
+            if len(text) in self.tables and text.isascii():
+                by_length.setdefault(len(text), []).append((i, text))
+
+        for length, candidates in by_length.items():
+            codes = np.frombuffer(''.join(text for _, text in candidates).encode('ascii'),
+                                  dtype=np.uint8).reshape(-1, length)
+            pending = np.ones(len(candidates), dtype=bool)
+            for region, table in self.tables[length]:
+                mapped = table[np.arange(length), codes]
+                valid = pending & np.all(mapped != 0, axis=1)
+                for k in np.flatnonzero(valid):
+                    results[candidates[k][0]] = (mapped[k].tobytes().decode('ascii'), region)
+                pending &= ~valid
+                if not pending.any():
+                    break
+        return results
+
+    def correct(self, texts):
+        """Return the corrected text of every candidate, None where no format matches."""
+        return [text for text, _ in self.match(texts)]
+
+    def first_valid(self, texts):
+        """
+        Find the first candidate that matches a format, e.g. among the EasyOCR reads of one crop.
+
+        Returns:
+            tuple: (index, corrected_text), or (None, None) if no candidate matches.
+        """
+        for i, text in enumerate(self.correct(texts)):
+            if text is not None:
+                return i, text
+        return None, None
+
+
+_default_grammar = None
+
+
+def get_plate_grammar():
+    """Return the grammar of PLATE_FORMATS, compiled on first use."""
+    global _default_grammar
+    if _default_grammar is None:
+        _default_grammar = PlateGrammar()
+    return _default_grammar
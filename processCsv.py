@@ -1,22 +1,26 @@
-import pandas as pd
+from plate_aggregator import PlateAggregator
+from results_table import read_results, write_results
+
+def best_plates(results):
+    """
+    One row per car_id (a ResultsTable): the row with the highest license_number_score, with
+    the plate voted from all reads of the car as license_number (see plate_aggregator).
+    """
+    return PlateAggregator.from_table(read_results(results)).table()
 
 def final_csv(input_file: str, output_file = "output/final_csv.csv"):
-    # Load CSV file
-    df = pd.read_csv(input_file)
-    
-    # Convert confidence values to numeric (in case of string format)
-    df['license_number_score'] = pd.to_numeric(df['license_number_score'], errors='coerce')
-    
-    # Drop duplicates by keeping only the row with the highest confidence per car_id
-    df_filtered = df.loc[df.groupby('car_id')['license_number_score'].idxmax()]
-    
+    # Drop duplicates by keeping only the best read per car_id; input_file is a CSV file,
+    # a column directory or a ResultsTable. A PlateAggregator fed while processing gives the
+    # same rows without this pass: write_results(aggregator.table(), output_file)
+    table_filtered = best_plates(input_file)
+
     # Save the cleaned data
-    df_filtered.to_csv(output_file, index=False)
-    
+    write_results(table_filtered, output_file)
+
     print(f"Filtered data saved to {output_file}")
-    
+
     return output_file
 
 
 if __name__ == '__main__':
-    final_csv("output/test_interpolated.csv")
\ No newline at end of file
+    final_csv("output/test_interpolated.csv")
@@ -1,128 +1,532 @@
-from ultralytics import YOLO
 import cv2
 import numpy as np
-from sort.sort import Sort
-from util import get_car, read_license_plate, write_csv
+from sort.sort import KalmanBoxTracker, iou_batch
+from model_registry import get_vehicle_detector, get_license_plate_detector, new_tracker
+from util import get_cars, read_license_plate, read_license_plates, open_results_sink
+from stages import run_pipeline, format_stage_report
+from frame_stride import FrameStride
+from results_table import ResultsCollector
 
 def initialize_models():
-    """Load the YOLO models and initialize the tracker."""
-    coco_model = YOLO('models/yolov8n.pt').to("cuda")
-    license_plate_detector = YOLO('models/license_plate_detector.pt').to("cuda")
-    mot_tracker = Sort()
+    """Get the YOLO models (loaded once per process) and initialize a fresh tracker."""
+    coco_model = get_vehicle_detector()
+    license_plate_detector = get_license_plate_detector()
+    mot_tracker = new_tracker()
     return coco_model, license_plate_detector, mot_tracker
 
+# HSV ranges of clearly yellow and clearly green pixels, for yellow text on a green plate
+_YELLOW_TEXT = (np.array([20, 51, 51], dtype=np.uint8), np.array([29, 255, 255], dtype=np.uint8))
+_GREEN_PLATE = (np.array([45, 51, 51], dtype=np.uint8), np.array([85, 255, 255], dtype=np.uint8))
+
+def classify_license_plate_colors(license_plate_crops, text_fraction=0.15):
+    """
+    Classify the color of a batch of license plate crops.
+
+    Each crop gets one HSV conversion and its mean HSV comes from cv2.mean, straight from the
+    uint8 pixels. Only green plates also count their clearly yellow and clearly green pixels
+    (cv2.inRange, cv2.countNonZero): one whose pixels are mostly green with at least
+    text_fraction yellow pixels is "Yellow text on Green" (the old per-crop check for it could
+    never be reached).
+
+    Returns:
+        list: One of "Green", "Yellow", "White", "Yellow text on Green" or "Unknown" per crop.
+    """
+    colors = []
+    for crop in license_plate_crops:
+        if crop is None or crop.size == 0:
+            colors.append("Unknown")
+            continue
+        hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
+        h, s, v, _ = cv2.mean(hsv)
+
+        if 35 <= h <= 85 and s > 50 and v > 50:
+            pixels = crop.shape[0] * crop.shape[1]
+            green_share = cv2.countNonZero(cv2.inRange(hsv, *_GREEN_PLATE)) / pixels
+            yellow_share = cv2.countNonZero(cv2.inRange(hsv, *_YELLOW_TEXT)) / pixels
+            colors.append("Yellow text on Green" if green_share >= 0.5 and yellow_share >= text_fraction
+                          else "Green")
+        elif 20 <= h <= 35 and s > 50 and v > 50:
+            colors.append("Yellow")
+        elif v > 150 and s < 50:
+            colors.append("White")
+        else:
+            colors.append("Unknown")
+    return colors
+
 def classify_license_plate_color(license_plate_crop):
-    """Classify the license plate color into one of the four categories."""
-    hsv = cv2.cvtColor(license_plate_crop, cv2.COLOR_BGR2HSV)
-    avg_color = np.mean(hsv, axis=(0, 1))
-    h, s, v = avg_color
-    
-    if 35 <= h <= 85 and s > 50 and v > 50:
-        return "Green"
-    elif 20 <= h <= 35 and s > 50 and v > 50:
-        return "Yellow"
-    elif v > 150 and s < 50:
-        return "White"
-    elif 20 <= h <= 35 and s > 50 and v > 50 and np.mean(hsv[:, :, 2]) < 100:
-        return "Yellow text on Green"
-    else:
-        return "Unknown"
+    """Classify the color of a single license plate crop (see classify_license_plate_colors)."""
+    return classify_license_plate_colors([license_plate_crop])[0]
 
-def process_frame(frame, coco_model, license_plate_detector, mot_tracker, vehicles):
-    """Process a single frame for vehicle and license plate detection."""
-    results = {}
-    
-    # Detect vehicles
-    detections = coco_model(frame, stream=True)
-    detections = next(detections, None)
-    
-    detections_ = []
-    if detections and detections.boxes is not None:
-        for detection in detections.boxes.data.tolist():
-            x1, y1, x2, y2, score, class_id = detection
-            if int(class_id) in vehicles:
-                detections_.append([x1, y1, x2, y2, score])
-    
-    # Track vehicles
-    # Track vehicles
+def classify_candidates(batch_candidates, ocr_scheduler=None):
+    """
+    Classify the plate color of every candidate of one or more frames in one call.
+
+    With an OcrScheduler, candidates it will most likely not read (OcrScheduler.will_skip) are
+    left out; read_plates classifies any read candidate that has no color yet.
+    """
+    candidates = [candidate for i, candidates in enumerate(batch_candidates) for candidate in candidates
+                  if ocr_scheduler is None or
+                  not ocr_scheduler.will_skip(candidate['car_id'], candidate['license_plate'], i + 1)]
+    for candidate, color in zip(candidates, classify_license_plate_colors([c['crop'] for c in candidates])):
+        candidate['color'] = color
+    return batch_candidates
+
+def detect_vehicles(frames, coco_model, vehicles):
+    """Run the vehicle detector once over a batch of frames and keep the vehicle boxes of each frame."""
+    batch_detections = []
+    for detections in coco_model(frames, stream=True):
+        detections_ = []
+        if detections and detections.boxes is not None:
+            for detection in detections.boxes.data.tolist():
+                x1, y1, x2, y2, score, class_id = detection
+                if int(class_id) in vehicles:
+                    detections_.append([x1, y1, x2, y2, score])
+        batch_detections.append(detections_)
+    return batch_detections
+
+def detect_license_plates(frames, license_plate_detector):
+    """Run the license plate detector once over a batch of frames."""
+    batch_plates = []
+    for license_plates in license_plate_detector(frames, stream=True):
+        if license_plates and license_plates.boxes is not None:
+            batch_plates.append(license_plates.boxes.data.tolist())
+        else:
+            batch_plates.append([])
+    return batch_plates
+
+def detect_license_plates_roi(frames, batch_track_ids, license_plate_detector, margin=0.1, iou_threshold=0.7):
+    """
+    Run the license plate detector only on regions around the tracked vehicles.
+
+    The car boxes of every frame, grown by margin on each side, are cropped and sent
+    through the detector as one batch; the plate boxes are mapped back to frame
+    coordinates. Plates found twice in overlapping car crops are merged, keeping the
+    higher score. Frames without tracks cost nothing, and the detector is not called
+    at all when the whole batch has no tracks.
+
+    Returns:
+        list: The plate boxes [x1, y1, x2, y2, score, class_id] of each frame.
+    """
+    crops = []
+    offsets = []
+    for i, (frame, track_ids) in enumerate(zip(frames, batch_track_ids)):
+        height, width = frame.shape[:2]
+        for xcar1, ycar1, xcar2, ycar2, car_id in track_ids:
+            pad_x = (xcar2 - xcar1) * margin
+            pad_y = (ycar2 - ycar1) * margin
+            x1, y1 = max(int(xcar1 - pad_x), 0), max(int(ycar1 - pad_y), 0)
+            x2, y2 = min(int(xcar2 + pad_x), width), min(int(ycar2 + pad_y), height)
+            if x2 > x1 and y2 > y1:
+                crops.append(frame[y1:y2, x1:x2, :])
+                offsets.append((i, x1, y1))
+
+    batch_plates = [[] for _ in frames]
+    if not crops:
+        return batch_plates
+
+    for (i, x_offset, y_offset), license_plates in zip(offsets, license_plate_detector(crops, stream=True)):
+        if license_plates and license_plates.boxes is not None:
+            for x1, y1, x2, y2, score, class_id in license_plates.boxes.data.tolist():
+                batch_plates[i].append([x1 + x_offset, y1 + y_offset, x2 + x_offset, y2 + y_offset, score, class_id])
+
+    for i, license_plates in enumerate(batch_plates):
+        if len(license_plates) > 1:
+            license_plates.sort(key=lambda plate: plate[4], reverse=True)
+            boxes = np.asarray(license_plates)[:, :4]
+            overlaps = iou_batch(boxes, boxes)
+            keep = []
+            for j in range(len(license_plates)):
+                if all(overlaps[j, k] <= iou_threshold for k in keep):
+                    keep.append(j)
+            batch_plates[i] = [license_plates[j] for j in keep]
+    return batch_plates
+
+def track_vehicles(detections_, mot_tracker):
+    """Update the tracker with the vehicle detections of one frame."""
     if len(detections_) == 0:
-        track_ids = np.empty((0, 5))  # Prevent empty input error
+        return np.empty((0, 5))  # Prevent empty input error
+    return mot_tracker.update(np.asarray(detections_))
+
+def collect_plate_crops(frame, license_plates, track_ids):
+    """Assign the detected plates of one frame to tracked cars and cut out the plate crops."""
+    candidates = []
+    # Assign every license plate to a detected car at once
+    cars = get_cars(license_plates, track_ids)
+    for license_plate, (xcar1, ycar1, xcar2, ycar2, car_id) in zip(license_plates, cars):
+        x1, y1, x2, y2, score, class_id = license_plate
+
+        if car_id != -1:
+            license_plate_crop = frame[int(y1):int(y2), int(x1):int(x2), :]
+
+            if license_plate_crop is not None and license_plate_crop.size > 0:
+                license_plate_crop_gray = cv2.cvtColor(license_plate_crop, cv2.COLOR_BGR2GRAY)
+                _, license_plate_crop_thresh = cv2.threshold(license_plate_crop_gray, 64, 255, cv2.THRESH_BINARY_INV)
+
+                candidates.append({
+                    'car_id': car_id,
+                    'car_bbox': [xcar1, ycar1, xcar2, ycar2],
+                    'license_plate': license_plate,
+                    'crop': license_plate_crop,
+                    'crop_thresh': license_plate_crop_thresh
+                })
+    return candidates
+
+def live_track_ids(mot_tracker):
+    """Return the ids of every track the tracker still holds, matching the car_id column."""
+    if hasattr(mot_tracker, 'live_ids'):  # sort.vectorized.VectorizedSort
+        return mot_tracker.live_ids()
+    return [trk.id + 1 for trk in mot_tracker.trackers]
+
+def read_plates(batch_candidates, batch_ocr=False, ocr_scheduler=None, batch_live_ids=None):
+    """
+    Read text and color for the plate crops of one or more frames.
+
+    With batch_ocr=True every crop of every frame in batch_candidates goes through
+    the recognizer in a single call (util.read_license_plates). With an
+    OcrScheduler only the crops it schedules are read; the other plates reuse the
+    best read of their track. batch_live_ids holds the tracker's live ids for each
+    frame so the scheduler can evict dropped tracks.
+
+    Returns:
+        list: One results dict per frame, keyed by car id. Each license plate entry also
+        holds its 'crop', a view of the frame, so sinks can keep the crop of a best read, and
+        'cached', True where the scheduler reused an earlier read instead of running OCR.
+    """
+    scheduled = []
+    for i, candidates in enumerate(batch_candidates):
+        if ocr_scheduler is not None:
+            ocr_scheduler.advance(batch_live_ids[i] if batch_live_ids is not None else None)
+        for candidate in candidates:
+            candidate['read'] = (ocr_scheduler is None or
+                                 ocr_scheduler.schedule(candidate['car_id'], candidate['license_plate']))
+            if candidate['read']:
+                scheduled.append(candidate['crop_thresh'])
+
+    if batch_ocr:
+        reads = iter(read_license_plates(scheduled))
     else:
-        track_ids = mot_tracker.update(np.asarray(detections_))
-
-    # Detect license plates
-    license_plates = license_plate_detector(frame, stream=True)
-    license_plates = next(license_plates, None)
-    
-    if license_plates and license_plates.boxes is not None:
-        for license_plate in license_plates.boxes.data.tolist():
-            x1, y1, x2, y2, score, class_id = license_plate
-            
-            # Assign license plate to a detected car
-            xcar1, ycar1, xcar2, ycar2, car_id = get_car(license_plate, track_ids)
-            
-            if car_id != -1:
-                license_plate_crop = frame[int(y1):int(y2), int(x1):int(x2), :]
-                
-                if license_plate_crop is not None and license_plate_crop.size > 0:
-                    license_plate_crop_gray = cv2.cvtColor(license_plate_crop, cv2.COLOR_BGR2GRAY)
-                    _, license_plate_crop_thresh = cv2.threshold(license_plate_crop_gray, 64, 255, cv2.THRESH_BINARY_INV)
-                    
-                    # Read license plate number
-                    license_plate_text, license_plate_text_score = read_license_plate(license_plate_crop_thresh)
-                    
-                    # Determine license plate color
-                    license_plate_color = classify_license_plate_color(license_plate_crop)
-                    
-                    if license_plate_text is not None:
-                        results[car_id] = {
-                            'car': {'bbox': [xcar1, ycar1, xcar2, ycar2]},
-                            'license_plate': {
-                                'bbox': [x1, y1, x2, y2],
-                                'text': license_plate_text,
-                                'bbox_score': score,
-                                'text_score': license_plate_text_score,
-                                'color': license_plate_color
-                            }
-                        }
-    return results
-
-def process_input(input_source, output_csv=None):
-    """Process a video, image, or live feed dynamically."""
+        reads = (read_license_plate(crop) for crop in scheduled)
+    # Candidates that did not go through the color stage are classified together here
+    classify_candidates([[candidate for candidates in batch_candidates for candidate in candidates
+                          if candidate['read'] and 'color' not in candidate]])
+
+    batch_results = []
+    for candidates in batch_candidates:
+        results = {}
+        for candidate in candidates:
+            x1, y1, x2, y2, score, class_id = candidate['license_plate']
+
+            if candidate['read']:
+                # Read license plate number
+                license_plate_text, license_plate_text_score = next(reads)
+
+                license_plate_color = candidate['color']
+
+                if ocr_scheduler is not None:
+                    ocr_scheduler.record(candidate['car_id'], license_plate_text, license_plate_text_score,
+                                         license_plate_color)
+            else:
+                cached = ocr_scheduler.cached(candidate['car_id'])
+                if cached is None:
+                    continue
+                license_plate_text, license_plate_text_score, license_plate_color = cached
+
+            if license_plate_text is not None:
+                results[candidate['car_id']] = {
+                    'car': {'bbox': candidate['car_bbox']},
+                    'license_plate': {
+                        'bbox': [x1, y1, x2, y2],
+                        'text': license_plate_text,
+                        'bbox_score': score,
+                        'text_score': license_plate_text_score,
+                        'color': license_plate_color,
+                        'crop': candidate['crop'],
+                        'cached': not candidate['read']
+                    }
+                }
+        batch_results.append(results)
+    return batch_results
+
+def read_frame_plates(frame, license_plates, track_ids, batch_ocr=False, ocr_scheduler=None, live_ids=None):
+    """Assign the detected plates of one frame to tracked cars and read their text and color."""
+    return read_plates([collect_plate_crops(frame, license_plates, track_ids)], batch_ocr,
+                       ocr_scheduler, [live_ids])[0]
+
+def predict_tracks(mot_tracker):
+    """Advance every track by one frame on a frame without detection, without counting it as a miss."""
+    if hasattr(mot_tracker, 'coast'):  # sort.vectorized.VectorizedSort
+        mot_tracker.coast()
+        return
+    for trk in mot_tracker.trackers:
+        time_since_update, hit_streak = trk.time_since_update, trk.hit_streak
+        trk.predict()
+        trk.time_since_update, trk.hit_streak = time_since_update, hit_streak
+
+def _detect_stage(item, coco_model, license_plate_detector, vehicles, roi):
+    """Run the detectors on the frames of a batch item that are marked for detection."""
+    frames = [frame for frame, detect in zip(item['frames'], item['detect']) if detect]
+    detections = iter(detect_vehicles(frames, coco_model, vehicles) if frames else [])
+    item['detections'] = [next(detections) if detect else None for detect in item['detect']]
+    if not roi:
+        plates = iter(detect_license_plates(frames, license_plate_detector) if frames else [])
+        item['plates'] = [next(plates) if detect else [] for detect in item['detect']]
+    return item
+
+def _track_stage(item, mot_tracker, frame_stride, on_tracks=None):
+    """
+    Update (or, on skipped frames, only advance) the tracker for every frame of a batch item, in order.
+
+    on_tracks, if given, is called with the tracker output of every frame, in order.
+    """
+    item['track_ids'] = []
+    item['live_ids'] = []
+    for detections_ in item['detections']:
+        if detections_ is None:
+            predict_tracks(mot_tracker)
+            track_ids = np.empty((0, 5))
+        else:
+            track_ids = track_vehicles(detections_, mot_tracker)
+            if frame_stride is not None:
+                frame_stride.update(track_ids)
+        item['track_ids'].append(track_ids)
+        item['live_ids'].append(live_track_ids(mot_tracker))
+        if on_tracks is not None:
+            on_tracks(track_ids)
+    if 'plates' in item:
+        _crop_stage(item)
+    return item
+
+def _plates_roi_stage(item, license_plate_detector):
+    item['plates'] = detect_license_plates_roi(item['frames'], item['track_ids'], license_plate_detector)
+    return _crop_stage(item)
+
+def _crop_stage(item):
+    item['candidates'] = [collect_plate_crops(frame, license_plates, track_ids)
+                          for frame, license_plates, track_ids
+                          in zip(item['frames'], item['plates'], item['track_ids'])]
+    return item
+
+def _color_stage(item, ocr_scheduler=None):
+    classify_candidates(item['candidates'], ocr_scheduler)
+    return item
+
+def _batch_item(frames, frame_stride):
+    """Wrap a list of decoded frames, marking which ones get full detection."""
+    if frame_stride is None:
+        detect = [True] * len(frames)
+    else:
+        detect = [frame_stride.detect_now() for _ in frames]
+    return {'frames': frames, 'detect': detect}
+
+def process_batch(frames, coco_model, license_plate_detector, mot_tracker, vehicles, batch_ocr=False,
+                  ocr_scheduler=None, roi=False, frame_stride=None, on_tracks=None):
+    """Process a batch of consecutive frames, running each detector once over the whole batch.
+
+    The tracker is still updated frame by frame in order, so the results are the
+    same as calling process_frame on every frame. With batch_ocr=True all plate
+    crops of the batch are read in one recognizer call, and an OcrScheduler skips
+    reads of tracks whose plate is already known. With roi=True the plate detector
+    only looks at the regions around tracked vehicles (detect_license_plates_roi).
+    With a FrameStride only the frames it selects are detected; the tracks are
+    predicted forward on the others, which produce no results.
+    """
+    item = _batch_item(frames, frame_stride)
+    _detect_stage(item, coco_model, license_plate_detector, vehicles, roi)
+    _track_stage(item, mot_tracker, frame_stride, on_tracks)
+    if roi:
+        _plates_roi_stage(item, license_plate_detector)
+    _color_stage(item, ocr_scheduler)
+    return read_plates(item['candidates'], batch_ocr, ocr_scheduler, item['live_ids'])
+
+def process_frame(frame, coco_model, license_plate_detector, mot_tracker, vehicles, batch_ocr=False,
+                  ocr_scheduler=None, roi=False):
+    """Process a single frame for vehicle and license plate detection."""
+    return process_batch([frame], coco_model, license_plate_detector, mot_tracker, vehicles, batch_ocr,
+                         ocr_scheduler, roi)[0]
+
+def read_batches(cap, batch_size, max_frames=None):
+    """Decode frames from an open capture and yield them in lists of up to batch_size frames.
+
+    With max_frames, decoding stops after that many frames.
+    """
+    frames = []
+    while max_frames is None or max_frames > 0:
+        if max_frames is not None:
+            max_frames -= 1
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+        if len(frames) >= max(batch_size, 1):
+            yield frames
+            frames = []
+    if frames:
+        yield frames
+
+def process_pipelined(cap, coco_model, license_plate_detector, mot_tracker, vehicles, batch_size=1, queue_size=4,
+                      batch_ocr=False, ocr_scheduler=None, roi=False, frame_stride=None, max_frames=None,
+                      on_tracks=None):
+    """
+    Process a capture as a staged pipeline: decode, detect, track and OCR each run on their own
+    thread, connected by bounded queues.
+
+    Tracking is a single worker that sees the batches in decode order, so Sort.update is called
+    exactly as in the sequential path and the results are the same. In ROI mode the plate
+    detector needs the tracks, so it gets its own stage between tracking and OCR. Plate colors
+    are classified for all crops of a batch at once in a color stage before OCR. With an
+    adaptive FrameStride the decode stage picks the detection frames while the tracking stage
+    adapts the stride, so adaptation lags by the batches waiting in the queues.
+
+    Yields:
+        list: The results dict of every frame, one list per batch, in frame order.
+    """
+    stages = [('detect', lambda item: _detect_stage(item, coco_model, license_plate_detector, vehicles, roi)),
+              ('track', lambda item: _track_stage(item, mot_tracker, frame_stride, on_tracks))]
+    if roi:
+        stages.append(('plates', lambda item: _plates_roi_stage(item, license_plate_detector)))
+    stages.append(('color', lambda item: _color_stage(item, ocr_scheduler)))
+    stages.append(('ocr', lambda item: read_plates(item['candidates'], batch_ocr, ocr_scheduler, item['live_ids'])))
+
+    stats = []
+    source = (_batch_item(frames, frame_stride) for frames in read_batches(cap, batch_size, max_frames))
+    yield from run_pipeline(source, stages, queue_size=queue_size, stats=stats,
+                            item_size=lambda item: len(item['frames']))
+    print(format_stage_report(stats))
+
+def process_input(input_source, output_csv=None, batch_size=1, pipelined=False, batch_ocr=False,
+                  ocr_scheduler=None, roi=False, stride=1, adaptive_stride=False, resume=False, progress=None,
+                  start_frame=0, end_frame=None, table=False, aggregator=None, track_log=None):
+    """Process a video, image, or live feed dynamically.
+
+    With batch_size > 1 the decoded frames are collected in groups of batch_size
+    and each YOLO model runs once per group instead of once per frame. With
+    pipelined=True decoding, detection, tracking and OCR overlap on separate
+    threads (see process_pipelined); this is ignored for the live feed. With
+    batch_ocr=True the plate crops of each batch are read in one recognizer call.
+    Pass an OcrScheduler to stop reading plates of tracks that are already confirmed.
+    With roi=True the plate detector only runs on the regions around tracked vehicles.
+    With stride > 1 (or adaptive_stride=True) full detection only runs on every
+    stride-th frame; run process_interpolation on the CSV to fill the frames in between.
+
+    Rows are appended to output_csv as each frame finishes: a .csv path gets a CSV file
+    (see util.ResultsSink), any other path a column directory (see results_table).
+    With resume=True a partially written output_csv is continued: decoding skips to
+    its last frame and new track ids start after the ones already written.
+    progress, if given, is called as progress(frames_done, frames_total) after each batch.
+
+    start_frame and end_frame limit a video to the frames [start_frame, end_frame); the
+    rows keep their frame numbers in the whole video (see sharding.process_sharded).
+
+    With table=True the rows are also collected in memory and returned as a
+    results_table.ResultsTable (empty if no plates were found), so the next stage can
+    use them without reading output_csv back; output_csv may then be None.
+    Every row is also passed to aggregator (a plate_aggregator.PlateAggregator) if given,
+    which is closed at the end so all its tracks have their final plate.
+    track_log, if given, is called as track_log(frame_nmr, track_ids) with the SORT output of
+    every processed frame (rows of x1, y1, x2, y2, car_id; empty on frames without detection).
+    """
     coco_model, license_plate_detector, mot_tracker = initialize_models()
     vehicles = [2, 3, 5, 7]  # COCO dataset vehicle class IDs
     real_feed = False
-    
+
     if isinstance(input_source, str):
         cap = cv2.VideoCapture(input_source)
     else:
         cap = cv2.VideoCapture(0)  # Real-time feed
         real_feed = True
-    
+        batch_size = 1  # Keep the live view responsive
+        pipelined = False
+
+    frame_stride = None
+    if stride > 1 or adaptive_stride:
+        frame_stride = FrameStride(stride, adaptive=adaptive_stride)
+
+    frames_total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if not real_feed else 0
     frame_nmr = -1
-    results = {}
-    
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        frame_nmr += 1
-        frame_results = process_frame(frame, coco_model, license_plate_detector, mot_tracker, vehicles)
-        if frame_results:
-            results[frame_nmr] = frame_results  # Merge instead of nesting under frame number
-        
-        if real_feed:
-            cv2.imshow('Vehicle Number Plate Recognition', frame)
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                break
-    
-    cap.release()
-    cv2.destroyAllWindows()
-    
-    if results:
-        write_csv(results, output_csv)
+    max_frames = None
+    if not real_feed and (start_frame > 0 or end_frame is not None):
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+            frame_nmr = start_frame - 1
+        end_frame = frames_total if end_frame is None else min(end_frame, frames_total)
+        frames_total = end_frame
+    sink = open_results_sink(output_csv, resume=resume) if output_csv is not None else None
+    if sink is not None and sink.next_frame > 0:
+        KalmanBoxTracker.count = max(KalmanBoxTracker.count, sink.max_car_id)
+        while frame_nmr + 1 < sink.next_frame and cap.grab():
+            frame_nmr += 1
+    if end_frame is not None:
+        max_frames = max(end_frame - frame_nmr - 1, 0)
+
+    collector = ResultsCollector() if table else None
+
+    on_tracks = None
+    if track_log is not None:
+        tracked = [frame_nmr]
+
+        def on_tracks(track_ids):
+            tracked[0] += 1
+            track_log(tracked[0], track_ids)
+
+    def write_frame(frame_results):
+        if sink is not None and frame_results:
+            sink.write_frame(frame_nmr, frame_results)
+        if collector is not None and frame_results:
+            collector.write_frame(frame_nmr, frame_results)
+        if aggregator is not None and frame_results:
+            aggregator.write_frame(frame_nmr, frame_results)
+
+    batches = None
+    try:
+        if pipelined:
+            batches = process_pipelined(cap, coco_model, license_plate_detector, mot_tracker, vehicles, batch_size,
+                                        batch_ocr=batch_ocr, ocr_scheduler=ocr_scheduler, roi=roi,
+                                        frame_stride=frame_stride, max_frames=max_frames, on_tracks=on_tracks)
+            for batch_results in batches:
+                for frame_results in batch_results:
+                    frame_nmr += 1
+                    write_frame(frame_results)
+                if progress is not None:
+                    progress(frame_nmr + 1, frames_total)
+        else:
+            for frames in read_batches(cap, batch_size, max_frames):
+                batch_results = process_batch(frames, coco_model, license_plate_detector, mot_tracker, vehicles,
+                                              batch_ocr, ocr_scheduler, roi, frame_stride, on_tracks)
+                stop = False
+                for frame, frame_results in zip(frames, batch_results):
+                    frame_nmr += 1
+                    write_frame(frame_results)
+
+                    if real_feed:
+                        cv2.imshow('Vehicle Number Plate Recognition', frame)
+                        key = cv2.waitKey(1) & 0xFF
+                        if key == ord('q'):
+                            stop = True
+                            break
+                if progress is not None:
+                    progress(frame_nmr + 1, frames_total)
+                if stop:
+                    break
+    finally:
+        if batches is not None:
+            # Stops the pipeline threads, so the decode thread is done with cap before it is released
+            batches.close()
+        cap.release()
+        if sink is not None:
+            sink.close()
+        if aggregator is not None:
+            aggregator.close()
+    if real_feed:
+        cv2.destroyAllWindows()
+
+    if frame_stride is not None:
+        print(frame_stride.report())
+    if ocr_scheduler is not None:
+        print(f"OCR ran on {ocr_scheduler.reads} plates, skipped {ocr_scheduler.skipped}")
+
+    if collector is not None:
+        return collector.table()
+    if sink is not None and sink.rows > 0:
         return output_csv
     else:
         return None
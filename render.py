@@ -0,0 +1,101 @@
+import os
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+# Render settings, read from the environment by RenderOptions.from_env():
+#   VNPR_RENDER         0 to skip the annotated video and only return the plate data (default: 1)
+#   VNPR_RENDER_SCALE   output size as a fraction of the input size (default: 1.0)
+#   VNPR_RENDER_STEP    write every n-th frame, at 1/n of the input frame rate (default: 1)
+#   VNPR_RENDER_WRITER  opencv or ffmpeg (default: opencv)
+#   VNPR_RENDER_CODEC   fourcc for opencv (default: mp4v), encoder for ffmpeg (default: libx264)
+#   VNPR_RENDER_PRESET  ffmpeg encoder preset (default: veryfast)
+#   VNPR_RENDER_CRF     ffmpeg constant rate factor (default: encoder default)
+
+
+class RenderOptions:
+    """
+    How visualize.process_video renders the annotated video.
+
+    scale shrinks the output; frames are resized before anything is drawn on them, so the
+    drawing also gets cheaper. frame_step keeps one frame out of frame_step (the output frame
+    rate drops accordingly) and the dropped frames are only grabbed, not decoded.
+    overlays=False draws the boxes without the best plate crops.
+    enabled=False skips rendering altogether.
+    """
+
+    def __init__(self, enabled=True, scale=1.0, frame_step=1, writer='opencv', codec=None, preset='veryfast',
+                 crf=None, overlays=True):
+        if writer not in ('opencv', 'ffmpeg'):
+            raise ValueError(f"Unknown video writer {writer!r}, expected 'opencv' or 'ffmpeg'")
+        self.enabled = enabled
+        self.scale = float(scale)
+        self.frame_step = max(int(frame_step), 1)
+        self.writer = writer
+        self.codec = codec or ('libx264' if writer == 'ffmpeg' else 'mp4v')
+        self.preset = preset
+        self.crf = crf
+        self.overlays = overlays
+
+    @classmethod
+    def from_env(cls):
+        crf = os.environ.get('VNPR_RENDER_CRF')
+        return cls(enabled=os.environ.get('VNPR_RENDER', '1') == '1',
+                   scale=float(os.environ.get('VNPR_RENDER_SCALE', '1.0')),
+                   frame_step=int(os.environ.get('VNPR_RENDER_STEP', '1')),
+                   writer=os.environ.get('VNPR_RENDER_WRITER', 'opencv'),
+                   codec=os.environ.get('VNPR_RENDER_CODEC') or None,
+                   preset=os.environ.get('VNPR_RENDER_PRESET', 'veryfast'),
+                   crf=int(crf) if crf else None)
+
+    def output_size(self, width, height):
+        """
+        Size of the rendered frames. Scaled sizes are rounded down to even numbers as most encoders
+        require; with the ffmpeg writer (yuv420p) the size is always even, also at scale 1.
+        """
+        if self.scale == 1.0 and self.writer != 'ffmpeg':
+            return width, height
+        return max(int(width * self.scale) // 2 * 2, 2), max(int(height * self.scale) // 2 * 2, 2)
+
+
+class FFmpegWriter:
+    """
+    Encode frames by piping raw BGR pixels to an ffmpeg process.
+
+    Same write/release interface as cv2.VideoWriter, with any encoder and preset ffmpeg offers
+    (e.g. libx264 with preset ultrafast, or h264_nvenc on NVIDIA GPUs).
+    """
+
+    def __init__(self, output_path, fps, size, codec='libx264', preset='veryfast', crf=None, ffmpeg='ffmpeg'):
+        executable = shutil.which(ffmpeg)
+        if executable is None:
+            raise RuntimeError(f"{ffmpeg} was not found; install ffmpeg or use the opencv writer")
+        self.size = tuple(size)
+        command = [executable, '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', '{}x{}'.format(*self.size), '-r', str(fps),
+                   '-i', '-', '-an', '-c:v', codec]
+        if preset:
+            command += ['-preset', preset]
+        if crf is not None:
+            command += ['-crf', str(crf)]
+        command += ['-pix_fmt', 'yuv420p', output_path]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, frame):
+        self.process.stdin.write(np.ascontiguousarray(frame).data)
+
+    def release(self):
+        if self.process.stdin.closed:
+            return
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with code {self.process.returncode}")
+
+
+def open_video_writer(output_path, fps, size, options):
+    """Open the writer selected by options for frames of the given (width, height)."""
+    if options.writer == 'ffmpeg':
+        return FFmpegWriter(output_path, fps, size, options.codec, options.preset, options.crf)
+    return cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*options.codec), fps, size)
@@ -0,0 +1,335 @@
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+from plate_grammar import PLATE_FORMATS, parse_template
+
+# Corrected plate numbers are as long as their format, so the longest format sets the text width
+PLATE_WIDTH = max(len(parse_template(template)) for _, template in PLATE_FORMATS)
+
+# Columns of a results table, in CSV order, as (name, dtype, shape of one row)
+SCHEMA = [('frame_nmr', np.int64, ()),
+          ('car_id', np.int64, ()),
+          ('car_bbox', np.float64, (4,)),
+          ('license_plate_bbox', np.float64, (4,)),
+          ('license_plate_bbox_score', np.float64, ()),
+          ('license_number', '<U{}'.format(PLATE_WIDTH), ()),
+          ('license_number_score', np.float64, ()),
+          ('license_plate_color', '<U24', ())]
+
+COLUMNS = [name for name, _, _ in SCHEMA]
+
+
+# Every column file starts with a .npy header of this fixed size, so the row count can be
+# rewritten in place while rows are appended
+HEADER_SIZE = 128
+
+
+def _typed_column(name, values, dtype):
+    """Convert values to the column dtype; raises ValueError instead of truncating text that does not fit."""
+    if np.dtype(dtype).kind == 'U':
+        values = np.asarray(values, dtype=str)
+        if values.dtype.itemsize > np.dtype(dtype).itemsize:
+            raise ValueError("{} values of up to {} characters do not fit the {} column".format(
+                name, values.dtype.itemsize // 4, np.dtype(dtype).str))
+    return np.asarray(values, dtype=dtype)
+
+
+def parse_bboxes(column):
+    """Parses a column of '[x1 y1 x2 y2]' strings into an (n, 4) float array in one pass."""
+    return np.array(' '.join(value.strip('[]') for value in column).split(), dtype=float).reshape(-1, 4)
+
+
+def is_csv(path):
+    """Results paths ending in .csv are CSV files; any other path is a column directory."""
+    return str(path).lower().endswith('.csv')
+
+
+def frame_rows(frame_results):
+    """
+    Unpack one frame's {car_id: {'car': ..., 'license_plate': ...}} results dict into rows.
+
+    Yields:
+        tuple: (car_id, car_bbox, license_plate_bbox, bbox_score, text, text_score, color) for
+        every car that has both a car and a license plate entry, as the sinks' write() takes them.
+    """
+    for car_id, result in frame_results.items():
+        if 'car' in result and 'license_plate' in result:
+            plate = result['license_plate']
+            yield (car_id, result['car']['bbox'], plate['bbox'], plate['bbox_score'], plate['text'],
+                   plate['text_score'], plate['color'])
+
+
+def _npy_header(dtype, shape):
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': {!r}, }}".format(
+        np.lib.format.dtype_to_descr(np.dtype(dtype)), shape)
+    header = header.ljust(HEADER_SIZE - 11) + '\n'
+    return np.lib.format.MAGIC_PREFIX + b'\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+class ResultsTable:
+    """
+    Detection results as typed NumPy columns, one entry per (frame, car) row.
+
+    Bboxes are (n, 4) float columns, so no stage has to parse them from text. On disk a
+    table is a directory holding one .npy file per column; load() memory-maps the columns,
+    so opening even a large table costs no parsing and only the rows used are read.
+    CSV (the layout of util.ResultsSink) is kept for exports and older files.
+    """
+
+    def __init__(self, columns):
+        self.columns = {name: np.asarray(columns[name]) for name in COLUMNS}
+
+    @classmethod
+    def empty(cls):
+        return cls({name: np.empty((0,) + shape, dtype=dtype) for name, dtype, shape in SCHEMA})
+
+    def __len__(self):
+        return len(self.columns['frame_nmr'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @classmethod
+    def concat(cls, tables):
+        """Stack the rows of several tables into one."""
+        tables = list(tables)
+        if not tables:
+            return cls.empty()
+        return cls({name: np.concatenate([table[name] for table in tables]) for name in COLUMNS})
+
+    def take(self, index):
+        """Return a new table holding the rows at index (an index array or a boolean mask)."""
+        return ResultsTable({name: column[index] for name, column in self.columns.items()})
+
+    def best_rows(self):
+        """
+        Find the highest license_number_score row of every car, the first one on ties.
+
+        Returns:
+            np.ndarray: One row index per car, in increasing car_id order.
+        """
+        car_id = self.columns['car_id']
+        order = np.lexsort((np.arange(len(car_id)), -self.columns['license_number_score'], car_id))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = car_id[order][1:] != car_id[order][:-1]
+        return order[first]
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Build a table from a DataFrame with the CSV columns (bboxes as '[x1 y1 x2 y2]' strings)."""
+        columns = {}
+        for name, dtype, shape in SCHEMA:
+            if name not in df:
+                columns[name] = np.zeros((len(df),) + shape, dtype=dtype)
+            elif shape:
+                columns[name] = parse_bboxes(df[name].astype(str))
+            elif np.dtype(dtype).kind == 'U':
+                columns[name] = _typed_column(name, df[name].fillna('').astype(str).to_numpy(), dtype)
+            else:
+                columns[name] = pd.to_numeric(df[name], errors='coerce').to_numpy().astype(dtype)
+        return cls(columns)
+
+    @classmethod
+    def from_csv(cls, path):
+        return cls.from_dataframe(pd.read_csv(path, dtype={'license_number': str, 'license_plate_color': str},
+                                              keep_default_na=False, float_precision='round_trip'))
+
+    def to_csv(self, path, brackets=False):
+        """Export the table as CSV, with bboxes written as space-separated values ('[...]' with brackets=True)."""
+        bbox = '[{} {} {} {}]' if brackets else '{} {} {} {}'
+        with open(path, 'w') as f:
+            f.write(','.join(COLUMNS) + '\n')
+            for row in zip(*(self.columns[name].tolist() for name in COLUMNS)):
+                f.write('{},{},{},{},{},{},{},{}\n'.format(row[0], row[1], bbox.format(*row[2]), bbox.format(*row[3]),
+                                                           *row[4:]))
+
+    def to_records(self):
+        """Return the rows as JSON-friendly dicts, bboxes as lists of four floats."""
+        columns = [self.columns[name].tolist() for name in COLUMNS]
+        return [dict(zip(COLUMNS, row)) for row in zip(*columns)]
+
+    def to_dataframe(self):
+        """Return the table as a DataFrame with one column per bbox coordinate (car_bbox_x1, ...)."""
+        data = {}
+        for name in COLUMNS:
+            column = self.columns[name]
+            if column.ndim == 2:
+                for i, axis in enumerate(('x1', 'y1', 'x2', 'y2')):
+                    data['{}_{}'.format(name, axis)] = column[:, i]
+            else:
+                data[name] = column
+        return pd.DataFrame(data)
+
+    def save(self, path):
+        """Write the table as a column directory."""
+        os.makedirs(path, exist_ok=True)
+        for name, dtype, shape in SCHEMA:
+            column = np.ascontiguousarray(_typed_column(name, self.columns[name], dtype))
+            with open(os.path.join(path, name + '.npy'), 'wb') as f:
+                f.write(_npy_header(dtype, column.shape))
+                f.write(column.tobytes())
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a column directory; with mmap=True the columns are memory-mapped read-only."""
+        columns = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r' if mmap else None)
+                   for name in COLUMNS}
+        # A writer that stopped between two columns may have left one column a few rows longer
+        rows = min(len(column) for column in columns.values())
+        return cls({name: column[:rows] for name, column in columns.items()})
+
+
+def read_results(path, mmap=True):
+    """Read a results table from a column directory or a CSV file."""
+    if isinstance(path, ResultsTable):
+        return path
+    if is_csv(path):
+        return ResultsTable.from_csv(path)
+    return ResultsTable.load(path, mmap)
+
+
+def write_results(table, path, brackets=False):
+    """Write a results table to path, as CSV if it ends in .csv and as a column directory otherwise."""
+    if is_csv(path):
+        table.to_csv(path, brackets)
+    else:
+        table.save(path)
+    return path
+
+
+class ResultsCollector:
+    """
+    Collect detection results in memory as frames finish; table() returns them as a ResultsTable.
+
+    Same interface as util.ResultsSink. Rows are buffered as Python values and packed into
+    typed column chunks every flush_every frames, so long runs stay compact in memory.
+    """
+
+    def __init__(self, flush_every=50):
+        self.flush_every = flush_every
+        self.next_frame = 0
+        self.max_car_id = 0
+        self.rows = 0
+        self._pending_frames = 0
+        self._buffer = {name: [] for name in COLUMNS}
+        self._chunks = []
+
+    def write(self, frame_nmr, car_id, car_bbox, license_plate_bbox, bbox_score, text, text_score, color):
+        """Append one row."""
+        for name, value in zip(COLUMNS, (frame_nmr, car_id, car_bbox, license_plate_bbox, bbox_score, text,
+                                         text_score, color)):
+            self._buffer[name].append(value)
+
+    def write_frame(self, frame_nmr, frame_results):
+        """Append the rows of one frame, given as the {car_id: {'car': ..., 'license_plate': ...}} dict."""
+        for row in frame_rows(frame_results):
+            self.write(frame_nmr, *row)
+
+        self._pending_frames += 1
+        if self._pending_frames >= self.flush_every:
+            self.flush()
+
+    def _take_buffer(self):
+        """Pack the buffered rows into typed columns and empty the buffer."""
+        rows = len(self._buffer['frame_nmr'])
+        columns = {name: _typed_column(name, self._buffer[name], dtype).reshape((rows,) + shape)
+                   for name, dtype, shape in SCHEMA}
+        self._buffer = {name: [] for name in COLUMNS}
+        return columns
+
+    def flush(self):
+        if self._buffer['frame_nmr']:
+            chunk = ResultsTable(self._take_buffer())
+            self._chunks.append(chunk)
+            self.rows += len(chunk)
+        self._pending_frames = 0
+
+    def close(self):
+        self.flush()
+
+    def table(self):
+        """Return every row written so far as one ResultsTable."""
+        self.flush()
+        if len(self._chunks) > 1:
+            self._chunks = [ResultsTable.concat(self._chunks)]
+        return self._chunks[0] if self._chunks else ResultsTable.empty()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ResultsWriter(ResultsCollector):
+    """
+    Append detection results to a column directory as frames finish.
+
+    Same interface as util.ResultsSink. Rows are buffered and appended to the column files
+    every flush_every frames, after which the row count in each file's header is updated,
+    so a crash loses at most those frames and the directory always opens with load().
+    resume=True keeps an existing directory, dropping the rows of its last frame.
+    """
+
+    def __init__(self, output_path, flush_every=50, resume=False):
+        super().__init__(flush_every)
+        self.output_path = output_path
+
+        os.makedirs(output_path, exist_ok=True)
+        if resume and all(os.path.exists(self._path(name)) for name in COLUMNS):
+            self._truncate_last_frame()
+        self.files = {name: open(self._path(name), 'r+b' if self.rows else 'w+b') for name in COLUMNS}
+        self._write_headers()
+
+    def _path(self, name):
+        return os.path.join(self.output_path, name + '.npy')
+
+    def _truncate_last_frame(self):
+        """Drop the rows of the last (possibly partially written) frame of an existing directory."""
+        table = ResultsTable.load(self.output_path)
+        frame_nmr = np.array(table['frame_nmr'])
+        if len(frame_nmr):
+            self.next_frame = int(frame_nmr[-1])
+            kept = int(np.searchsorted(frame_nmr, self.next_frame))
+            self.max_car_id = int(table['car_id'][:kept].max()) if kept else 0
+            self.rows = kept
+        del table
+        for name, dtype, shape in SCHEMA:
+            with open(self._path(name), 'r+b') as f:
+                f.truncate(HEADER_SIZE + self.rows * np.dtype(dtype).itemsize * int(np.prod(shape)))
+
+    def _write_headers(self):
+        for name, dtype, shape in SCHEMA:
+            f = self.files[name]
+            f.seek(0)
+            f.write(_npy_header(dtype, (self.rows,) + shape))
+            f.seek(0, os.SEEK_END)
+
+    def flush(self):
+        if self._buffer['frame_nmr']:
+            columns = self._take_buffer()
+            for name in COLUMNS:
+                self.files[name].write(columns[name].tobytes())
+            for f in self.files.values():
+                f.flush()
+                os.fsync(f.fileno())
+            self.rows += len(columns['frame_nmr'])
+            self._write_headers()
+        for f in self.files.values():
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending_frames = 0
+
+    def close(self):
+        if not all(f.closed for f in self.files.values()):
+            self.flush()
+            for f in self.files.values():
+                f.close()
+
+    def table(self):
+        """Return every row written so far, memory-mapped from the column directory."""
+        self.flush()
+        return ResultsTable.load(self.output_path)
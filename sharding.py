@@ -0,0 +1,185 @@
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from results_table import ResultsTable, is_csv, read_results, write_results
+from sort.sort import iou_batch, linear_assignment
+
+
+def plan_segments(frames_total, shards, overlap=30):
+    """
+    Split a video into shards segments of consecutive frames.
+
+    Every segment but the first also starts overlap frames before the end of the previous
+    one, so its tracker is warmed up and its tracks can be matched with the previous segment's.
+
+    Returns:
+        list: One (start, core_start, end) tuple per segment: frames [start, end) are processed,
+        and the rows of frames [core_start, end) are kept in the combined output.
+    """
+    shards = max(min(int(shards), frames_total), 1)
+    bounds = np.linspace(0, frames_total, shards + 1).astype(int)
+    return [(max(int(core_start) - overlap, 0) if i > 0 else 0, int(core_start), int(end))
+            for i, (core_start, end) in enumerate(zip(bounds[:-1], bounds[1:]))]
+
+
+def _process_segment(input_source, segment_path, start, end, kwargs, track_ranges=()):
+    """
+    Run process_input on frames [start, end) and record the SORT outputs of the frames in track_ranges.
+
+    Returns:
+        tuple: process_input's result and {frame_nmr: (n, 5) array of x1, y1, x2, y2, car_id}.
+    """
+    from processingVideo import process_input
+    tracks = {}
+
+    def track_log(frame_nmr, track_ids):
+        if any(first <= frame_nmr < last for first, last in track_ranges):
+            tracks[frame_nmr] = np.asarray(track_ids, dtype=float).reshape(-1, 5)
+
+    result = process_input(input_source, segment_path, start_frame=start, end_frame=end, track_log=track_log,
+                           **kwargs)
+    return result, tracks
+
+
+def match_tracks(previous, tracks, iou_threshold=0.3):
+    """
+    Match the tracks of two segments on the overlap frames both tracked.
+
+    previous and tracks map frame numbers to the tracker outputs of each segment (rows of
+    x1, y1, x2, y2, car_id). Each pair of track ids is scored by the summed IoU of their car
+    boxes on the frames they share; pairs are assigned one to one, and a pair is only kept if
+    its mean IoU over the frames where both tracks appear reaches iou_threshold.
+
+    Returns:
+        dict: Track id in tracks -> matching track id in previous.
+    """
+    frames = [frame_nmr for frame_nmr in sorted(tracks)
+              if frame_nmr in previous and len(tracks[frame_nmr]) and len(previous[frame_nmr])]
+    if not frames:
+        return {}
+
+    ids, index = np.unique(np.concatenate([tracks[f][:, 4] for f in frames]).astype(int), return_inverse=True)
+    prev_ids, prev_index = np.unique(np.concatenate([previous[f][:, 4] for f in frames]).astype(int),
+                                     return_inverse=True)
+
+    overlap_iou = np.zeros((len(ids), len(prev_ids)))
+    shared = np.zeros((len(ids), len(prev_ids)))
+    offset = prev_offset = 0
+    for frame_nmr in frames:
+        here, there = tracks[frame_nmr], previous[frame_nmr]
+        rows_idx = index[offset:offset + len(here)][:, None]
+        cols_idx = prev_index[prev_offset:prev_offset + len(there)][None, :]
+        np.add.at(overlap_iou, (rows_idx, cols_idx), iou_batch(here[:, :4], there[:, :4]))
+        np.add.at(shared, (rows_idx, cols_idx), 1)
+        offset += len(here)
+        prev_offset += len(there)
+
+    matches = {}
+    for i, j in linear_assignment(-overlap_iou):
+        if shared[i, j] > 0 and overlap_iou[i, j] / shared[i, j] >= iou_threshold:
+            matches[int(ids[i])] = int(prev_ids[j])
+    return matches
+
+
+def stitch_segments(segment_tables, segment_tracks, segments, output_csv, iou_threshold=0.3):
+    """
+    Merge the results of every segment into one table with track ids that are unique across the video.
+
+    segment_tracks holds each segment's tracker outputs on its overlap frames (see
+    _process_segment). Tracks continuing from the previous segment keep its id (see
+    match_tracks); every other track with rows in the segment's own frames gets the next free
+    id. Only the rows of each segment's own frames are kept; the combined table is written to
+    output_csv (a CSV file or a column directory).
+
+    Returns:
+        int: Number of rows written.
+    """
+    next_id = 0
+    previous_tracks, previous_ids = {}, {}
+    stitched = []
+    for table, tracks, (start, core_start, end) in zip(segment_tables, segment_tracks, segments):
+        in_core = table['frame_nmr'] >= core_start
+        kept = table.take(in_core)
+        matches = match_tracks(previous_tracks, {frame_nmr: boxes for frame_nmr, boxes in tracks.items()
+                                                 if frame_nmr < core_start}, iou_threshold)
+
+        ids, index = np.unique(kept['car_id'], return_inverse=True)
+        new_ids = np.empty(len(ids), dtype=np.int64)
+        global_ids = {}
+        for i, car_id in enumerate(ids.tolist()):
+            if previous_ids.get(matches.get(car_id)) is not None:
+                new_ids[i] = previous_ids[matches[car_id]]
+            else:
+                next_id += 1
+                new_ids[i] = next_id
+            global_ids[car_id] = int(new_ids[i])
+
+        kept.columns['car_id'] = new_ids[index]
+        stitched.append(kept)
+        # The next segment's overlap lies at the end of this one
+        previous_tracks = {frame_nmr: boxes for frame_nmr, boxes in tracks.items() if frame_nmr >= core_start}
+        previous_ids = global_ids
+
+    combined = ResultsTable.concat(stitched)
+    write_results(combined, output_csv, brackets=True)
+    return len(combined)
+
+
+def process_sharded(input_source, output_csv, shards=None, overlap=30, iou_threshold=0.3, **kwargs):
+    """
+    Process one long video in parallel: split it into overlapping segments, run process_input
+    on each in its own process (with its own models and SORT tracker) and stitch the results.
+
+    Seeking to a segment start relies on cv2.CAP_PROP_POS_FRAMES, which is frame-accurate for
+    common containers. Extra keyword arguments are passed on to process_input; run
+    process_interpolation on the combined output as usual.
+
+    Args:
+        input_source (str): Path of the video.
+        output_csv (str): Combined output, a CSV file or a column directory; the segments are
+            written next to it as column directories.
+        shards (int): Number of segments and worker processes (default: one per CPU core).
+        overlap (int): Frames processed by two neighbouring segments, used to match their tracks.
+        iou_threshold (float): Minimum mean IoU for two tracks to be merged.
+
+    Returns:
+        str: output_csv, or None if no license plates were found.
+    """
+    cap = cv2.VideoCapture(input_source)
+    frames_total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    segments = plan_segments(frames_total, shards or os.cpu_count() or 1, overlap)
+    base = os.path.splitext(output_csv)[0] if is_csv(output_csv) else output_csv.rstrip('/')
+    segment_paths = ['{}_segment{}'.format(base, i) for i in range(len(segments))]
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(segments), mp_context=context) as executor:
+        # Each segment records its tracks on its own warm-up and on the next segment's warm-up
+        next_starts = [next_start for next_start, _, _ in segments[1:]] + [frames_total]
+        futures = [executor.submit(_process_segment, input_source, segment_path, start, end, kwargs,
+                                   [(start, core_start), (next_start, end)])
+                   for segment_path, (start, core_start, end), next_start
+                   in zip(segment_paths, segments, next_starts)]
+        results, segment_tracks = zip(*[future.result() for future in futures])
+
+    segment_tables = [read_results(segment_path, mmap=False) if result is not None else ResultsTable.empty()
+                      for segment_path, result in zip(segment_paths, results)]
+    written = stitch_segments(segment_tables, segment_tracks, segments, output_csv, iou_threshold)
+    for segment_path in segment_paths:
+        if os.path.exists(segment_path):
+            shutil.rmtree(segment_path)
+
+    print(f"Processed {frames_total} frames in {len(segments)} segments")
+    return output_csv if written > 0 else None
+
+
+if __name__ == '__main__':
+    input_source = "uploads/sample_small.mp4"
+    output_csv = 'output/test.csv'
+    print(process_sharded(input_source, output_csv))
@@ -33,15 +33,20 @@ from filterpy.kalman import KalmanFilter
 np.random.seed(0)
 
 
+# resolve the solver once: a failing import is retried (and costly) on every call
+try:
+  import lap
+except ImportError:
+  lap = None
+  from scipy.optimize import linear_sum_assignment
+
+
 def linear_assignment(cost_matrix):
-  try:
-    import lap
+  if lap is not None:
     _, x, y = lap.lapjv(cost_matrix, extend_cost=True)
     return np.array([[y[i],i] for i in x if i >= 0]) #
-  except ImportError:
-    from scipy.optimize import linear_sum_assignment
-    x, y = linear_sum_assignment(cost_matrix)
-    return np.array(list(zip(x, y)))
+  x, y = linear_sum_assignment(cost_matrix)
+  return np.stack((x, y), axis=1)
 
 
 def iou_batch(bb_test, bb_gt):
@@ -151,49 +156,129 @@ class KalmanBoxTracker(object):
     return convert_x_to_bbox(self.kf.x)
 
 
-def associate_detections_to_trackers(detections,trackers,iou_threshold = 0.3):
+def overlapping_pairs(bb_test, bb_gt):
+  """
+  Finds the pairs of boxes of bb_test and bb_gt that overlap with a sweep along x, instead of
+    testing every pair, and computes their IOU exactly as iou_batch does.
+
+  Returns the index arrays i (into bb_test) and j (into bb_gt) and the IOU of each pair
+  """
+  order = np.argsort(bb_gt[:, 0], kind='stable')
+  x1 = bb_gt[order, 0]
+  max_w = max((bb_gt[:, 2] - bb_gt[:, 0]).max(), 0.)
+  lo = np.searchsorted(x1, bb_test[:, 0] - max_w, side='left')
+  hi = np.searchsorted(x1, bb_test[:, 2], side='left')
+  counts = np.maximum(hi - lo, 0)
+  i = np.repeat(np.arange(len(bb_test)), counts)
+  j = order[np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+
+  bb_test, bb_gt = bb_test[i], bb_gt[j]
+  xx1 = np.maximum(bb_test[:, 0], bb_gt[:, 0])
+  yy1 = np.maximum(bb_test[:, 1], bb_gt[:, 1])
+  xx2 = np.minimum(bb_test[:, 2], bb_gt[:, 2])
+  yy2 = np.minimum(bb_test[:, 3], bb_gt[:, 3])
+  w = np.maximum(0., xx2 - xx1)
+  h = np.maximum(0., yy2 - yy1)
+  wh = w * h
+  o = wh / ((bb_test[:, 2] - bb_test[:, 0]) * (bb_test[:, 3] - bb_test[:, 1])
+    + (bb_gt[:, 2] - bb_gt[:, 0]) * (bb_gt[:, 3] - bb_gt[:, 1]) - wh)
+  keep = o > 0
+  return i[keep], j[keep], o[keep]
+
+
+def gated_assignment(dets, trks, ious, min_split_size=65536):
+  """
+  Solves the assignment maximising the total IOU, like linear_assignment(-iou_matrix), over the
+    overlapping pairs (dets[k], trks[k]) with IOU ious[k] only. The boxes are split into the
+    connected components of the overlap graph and each component is solved on its own; boxes
+    that overlap nothing are left unassigned instead of being paired at zero IOU.
+
+  Returns the matched pairs as a (k,2) array and their IOUs
+  """
+  if len(dets) == 0:
+    return np.empty((0,2),dtype=int), np.empty(0)
+  det_ids, det_index = np.unique(dets, return_inverse=True)
+  trk_ids, trk_index = np.unique(trks, return_inverse=True)
+
+  if len(det_ids) * len(trk_ids) <= min_split_size:
+    # splitting small problems costs more than it saves
+    labels = np.zeros(len(dets), dtype=int)
+  else:
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    n_nodes = len(det_ids) + len(trk_ids)
+    graph = coo_matrix((np.ones(len(dets)), (det_index, len(det_ids) + trk_index)), shape=(n_nodes, n_nodes))
+    _, node_labels = connected_components(graph, directed=False)
+    labels = node_labels[det_index]
+
+  # a component with a single detection or a single tracker is solved by its best pair,
+  # the others go through linear_assignment one by one
+  n_labels = labels.max() + 1
+  component_dets = np.bincount(np.unique(labels * len(det_ids) + det_index) // len(det_ids), minlength=n_labels)
+  component_trks = np.bincount(np.unique(labels * len(trk_ids) + trk_index) // len(trk_ids), minlength=n_labels)
+  star = (component_dets[labels] == 1) | (component_trks[labels] == 1)
+  best = np.flatnonzero(star)
+  best = best[np.lexsort((-ious[best], labels[best]))]
+  matches = [best[np.r_[True, labels[best][1:] != labels[best][:-1]]]] if len(best) else []
+  order = np.flatnonzero(~star)
+  order = order[np.argsort(labels[order], kind='stable')]
+  bounds = np.flatnonzero(np.diff(labels[order])) + 1
+  for pairs in (np.split(order, bounds) if len(order) else []):
+    rows, d = np.unique(det_index[pairs], return_inverse=True)
+    cols, t = np.unique(trk_index[pairs], return_inverse=True)
+    iou_matrix = np.zeros((len(rows), len(cols)))
+    pair_index = np.full((len(rows), len(cols)), -1)
+    iou_matrix[d, t] = ious[pairs]
+    pair_index[d, t] = pairs
+    m = linear_assignment(-iou_matrix).reshape(-1, 2).astype(int)
+    m = pair_index[m[:, 0], m[:, 1]]
+    matches.append(m[m >= 0])
+  matches = np.concatenate(matches)
+  matches = matches[np.lexsort((trks[matches], dets[matches]))]
+  return np.stack((dets[matches], trks[matches]), axis=1), ious[matches]
+
+
+def associate_detections_to_trackers(detections,trackers,iou_threshold = 0.3, dense_max_size=4096):
   """
   Assigns detections to tracked object (both represented as bounding boxes)
 
+  Only overlapping pairs are considered: up to dense_max_size pairs the full IOU matrix is
+  computed, above that the overlaps are found with overlapping_pairs.
+
   Returns 3 lists of matches, unmatched_detections and unmatched_trackers
   """
   if(len(trackers)==0):
     return np.empty((0,2),dtype=int), np.arange(len(detections)), np.empty((0,5),dtype=int)
 
-  iou_matrix = iou_batch(detections, trackers)
-
-  if min(iou_matrix.shape) > 0:
-    a = (iou_matrix > iou_threshold).astype(np.int32)
-    if a.sum(1).max() == 1 and a.sum(0).max() == 1:
-        matched_indices = np.stack(np.where(a), axis=1)
-    else:
-      matched_indices = linear_assignment(-iou_matrix)
+  if len(detections) * len(trackers) <= dense_max_size:
+    iou_matrix = iou_batch(detections, trackers)
+    dets, trks = np.nonzero(iou_matrix > 0)
+    ious = iou_matrix[dets, trks]
   else:
-    matched_indices = np.empty(shape=(0,2))
-
-  unmatched_detections = []
-  for d, det in enumerate(detections):
-    if(d not in matched_indices[:,0]):
-      unmatched_detections.append(d)
-  unmatched_trackers = []
-  for t, trk in enumerate(trackers):
-    if(t not in matched_indices[:,1]):
-      unmatched_trackers.append(t)
-
-  #filter out matched with low IOU
-  matches = []
-  for m in matched_indices:
-    if(iou_matrix[m[0], m[1]]<iou_threshold):
-      unmatched_detections.append(m[0])
-      unmatched_trackers.append(m[1])
-    else:
-      matches.append(m.reshape(1,2))
-  if(len(matches)==0):
-    matches = np.empty((0,2),dtype=int)
+    dets, trks, ious = overlapping_pairs(detections, trackers)
+
+  above = ious > iou_threshold
+  det_counts = np.bincount(dets[above], minlength=len(detections))
+  trk_counts = np.bincount(trks[above], minlength=len(trackers))
+  if det_counts.max(initial=0) == 1 and trk_counts.max(initial=0) == 1:
+    matched_indices = np.stack((dets[above], trks[above]), axis=1)
+    matched_ious = ious[above]
   else:
-    matches = np.concatenate(matches,axis=0)
+    matched_indices, matched_ious = gated_assignment(dets, trks, ious)
 
-  return matches, np.array(unmatched_detections), np.array(unmatched_trackers)
+  #filter out matched with low IOU
+  matches = matched_indices[matched_ious >= iou_threshold]
+  low = matched_indices[matched_ious < iou_threshold]
+
+  # unassigned boxes first, then the ones assigned below the threshold, as before
+  assigned_detections = np.zeros(len(detections), dtype=bool)
+  assigned_detections[matched_indices[:,0]] = True
+  assigned_trackers = np.zeros(len(trackers), dtype=bool)
+  assigned_trackers[matched_indices[:,1]] = True
+  unmatched_detections = np.concatenate((np.flatnonzero(~assigned_detections), low[:,0]))
+  unmatched_trackers = np.concatenate((np.flatnonzero(~assigned_trackers), low[:,1]))
+
+  return matches, unmatched_detections, unmatched_trackers
 
 
 class Sort(object):
@@ -0,0 +1,154 @@
+"""
+    Vectorized SORT backend.
+
+    Same tracking model and update(dets) API as sort.Sort, but the Kalman states and
+    covariances of all tracks live in stacked NumPy arrays and every predict/update
+    step runs once for all tracks instead of once per filterpy.KalmanFilter object.
+"""
+import numpy as np
+
+from sort.sort import KalmanBoxTracker, associate_detections_to_trackers
+
+# Constant velocity model of KalmanBoxTracker: state [x,y,s,r,vx,vy,vs], measurement [x,y,s,r]
+F = np.eye(7)
+F[0, 4] = F[1, 5] = F[2, 6] = 1.
+Q = np.eye(7)
+Q[-1, -1] *= 0.01
+Q[4:, 4:] *= 0.01
+R = np.eye(4)
+R[2:, 2:] *= 10.
+P0 = np.eye(7)
+P0[4:, 4:] *= 1000.  # give high uncertainty to the unobservable initial velocities
+P0 *= 10.
+
+
+def convert_bboxes_to_z(bboxes):
+  """
+  Takes (n,4+) boxes [x1,y1,x2,y2] and returns (n,4) measurements [x,y,s,r]
+  """
+  w = bboxes[:, 2] - bboxes[:, 0]
+  h = bboxes[:, 3] - bboxes[:, 1]
+  return np.stack((bboxes[:, 0] + w/2., bboxes[:, 1] + h/2., w * h, w / h), axis=1)
+
+
+def convert_x_to_bboxes(x):
+  """
+  Takes (n,4+) states [x,y,s,r,...] and returns (n,4) boxes [x1,y1,x2,y2]
+  """
+  w = np.sqrt(x[:, 2] * x[:, 3])
+  h = x[:, 2] / w
+  return np.stack((x[:, 0] - w/2., x[:, 1] - h/2., x[:, 0] + w/2., x[:, 1] + h/2.), axis=1)
+
+
+class VectorizedSort(object):
+  def __init__(self, max_age=1, min_hits=3, iou_threshold=0.3):
+    """
+    Sets key parameters for SORT
+    """
+    self.max_age = max_age
+    self.min_hits = min_hits
+    self.iou_threshold = iou_threshold
+    self.frame_count = 0
+    self.x = np.empty((0, 7))
+    self.P = np.empty((0, 7, 7))
+    self.ids = np.empty(0, dtype=int)
+    self.time_since_update = np.empty(0, dtype=int)
+    self.hits = np.empty(0, dtype=int)
+    self.hit_streak = np.empty(0, dtype=int)
+    self.age = np.empty(0, dtype=int)
+
+  def _keep(self, mask):
+    for name in ('x', 'P', 'ids', 'time_since_update', 'hits', 'hit_streak', 'age'):
+      setattr(self, name, getattr(self, name)[mask])
+
+  def _kalman_predict(self):
+    self.x[(self.x[:, 6] + self.x[:, 2]) <= 0, 6] *= 0.0
+    self.x = self.x @ F.T
+    self.P = F @ self.P @ F.T + Q
+    self.age += 1
+
+  def predict(self):
+    """
+    Advances every track and returns the (n,4) predicted boxes.
+    """
+    self._kalman_predict()
+    self.hit_streak[self.time_since_update > 0] = 0
+    self.time_since_update += 1
+    return convert_x_to_bboxes(self.x)
+
+  def coast(self):
+    """
+    Advances every track by one frame without detection, without counting it as a miss.
+    """
+    self._kalman_predict()
+
+  def _kalman_update(self, idx, dets):
+    z = convert_bboxes_to_z(dets)
+    x = self.x[idx]
+    P = self.P[idx]
+    y = z - x[:, :4]
+    PHT = P[:, :, :4]
+    S = P[:, :4, :4] + R
+    K = PHT @ np.linalg.inv(S)
+    self.x[idx] = x + (K @ y[:, :, None])[:, :, 0]
+    I_KH = np.broadcast_to(np.eye(7), P.shape).copy()
+    I_KH[:, :, :4] -= K
+    self.P[idx] = I_KH @ P @ I_KH.transpose(0, 2, 1) + K @ R @ K.transpose(0, 2, 1)
+
+    self.time_since_update[idx] = 0
+    self.hits[idx] += 1
+    self.hit_streak[idx] += 1
+
+  def _create(self, dets):
+    n = len(dets)
+    x = np.zeros((n, 7))
+    x[:, :4] = convert_bboxes_to_z(dets)
+    self.x = np.concatenate((self.x, x))
+    self.P = np.concatenate((self.P, np.broadcast_to(P0, (n, 7, 7))))
+    # Share the id counter with KalmanBoxTracker so ids stay unique whichever backend is used
+    self.ids = np.concatenate((self.ids, KalmanBoxTracker.count + np.arange(n)))
+    KalmanBoxTracker.count += n
+    zeros = np.zeros(n, dtype=int)
+    self.time_since_update = np.concatenate((self.time_since_update, zeros))
+    self.hits = np.concatenate((self.hits, zeros))
+    self.hit_streak = np.concatenate((self.hit_streak, zeros))
+    self.age = np.concatenate((self.age, zeros))
+
+  def live_ids(self):
+    """
+    Returns the ids of every track still held, as reported by update (+1).
+    """
+    return [int(i) + 1 for i in self.ids]
+
+  def update(self, dets=np.empty((0, 5))):
+    """
+    Params:
+      dets - a numpy array of detections in the format [[x1,y1,x2,y2,score],[x1,y1,x2,y2,score],...]
+    Requires: this method must be called once for each frame even with empty detections (use np.empty((0, 5)) for frames without detections).
+    Returns the a similar array, where the last column is the object ID, in the same order as sort.Sort.
+    """
+    self.frame_count += 1
+    trks = self.predict()
+    valid = ~np.any(np.isnan(trks), axis=1)
+    if not valid.all():
+      self._keep(valid)
+      trks = trks[valid]
+    matched, unmatched_dets, unmatched_trks = associate_detections_to_trackers(
+      dets, np.hstack((trks, np.zeros((len(trks), 1)))), self.iou_threshold)
+
+    # update matched trackers with assigned detections
+    if len(matched) > 0:
+      self._kalman_update(matched[:, 1], dets[matched[:, 0], :4])
+
+    # create and initialise new trackers for unmatched detections
+    if len(unmatched_dets) > 0:
+      self._create(dets[unmatched_dets.astype(int), :4])
+
+    states = convert_x_to_bboxes(self.x)
+    out = (self.time_since_update < 1) & ((self.hit_streak >= self.min_hits) | (self.frame_count <= self.min_hits))
+    ret = np.hstack((states, (self.ids + 1)[:, None]))[out][::-1]  # reversed, like sort.Sort
+    # remove dead tracklets
+    self._keep(self.time_since_update <= self.max_age)
+    if len(ret) > 0:
+      return ret
+    return np.empty((0, 5))
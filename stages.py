@@ -0,0 +1,152 @@
+import queue
+import threading
+import time
+
+_END = object()
+
+
+class StageStats:
+    """Counts the items a pipeline stage handled and the time it spent working on them."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.started = None
+        self.finished = None
+
+    @property
+    def wall(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def throughput(self):
+        """Items per second of busy time, i.e. what the stage could sustain on its own."""
+        return self.items / self.busy if self.busy > 0 else 0.0
+
+
+class _StageError:
+    def __init__(self, name, exc):
+        self.name = name
+        self.exc = exc
+
+
+def _put(q, item, stop):
+    """Put an item on a bounded queue without blocking forever once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def _source_worker(source, out_q, stats, stop, item_size):
+    stats.started = time.perf_counter()
+    try:
+        iterator = iter(source)
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            stats.busy += time.perf_counter() - start
+            stats.items += item_size(item)
+            if not _put(out_q, item, stop):
+                break
+    except Exception as exc:
+        _put(out_q, _StageError(stats.name, exc), stop)
+        return
+    finally:
+        stats.finished = time.perf_counter()
+    _put(out_q, _END, stop)
+
+
+def _stage_worker(fn, in_q, out_q, stats, stop, item_size):
+    stats.started = time.perf_counter()
+    try:
+        while True:
+            item = _get(in_q, stop)
+            if item is _END or isinstance(item, _StageError):
+                _put(out_q, item, stop)
+                return
+            start = time.perf_counter()
+            try:
+                result = fn(item)
+            except Exception as exc:
+                _put(out_q, _StageError(stats.name, exc), stop)
+                return
+            stats.busy += time.perf_counter() - start
+            stats.items += item_size(item)
+            if not _put(out_q, result, stop):
+                return
+    finally:
+        stats.finished = time.perf_counter()
+
+
+def _one(item):
+    return 1
+
+
+def run_pipeline(source, stages, source_name='decode', queue_size=4, stats=None, item_size=_one):
+    """
+    Run a chain of stages, each on its own thread, connected by bounded queues.
+
+    Args:
+        source (iterable): Produces the items fed into the first stage. It is iterated on its own thread.
+        stages (list): List of (name, fn) tuples. Each fn maps one item to the item passed to the next stage.
+        source_name (str): Name reported for the source stage.
+        queue_size (int): Maximum number of items waiting between two stages.
+        stats (list): Optional list that receives one StageStats per stage, source first.
+        item_size (callable): Number of work units (e.g. frames) in an item, used for the throughput counts.
+
+    Yields:
+        The output of the last stage, in source order.
+    """
+    stop = threading.Event()
+    stage_stats = [StageStats(source_name)] + [StageStats(name) for name, _ in stages]
+    if stats is not None:
+        stats.extend(stage_stats)
+
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    threads = [threading.Thread(target=_source_worker, args=(source, queues[0], stage_stats[0], stop, item_size), daemon=True)]
+    for i, (name, fn) in enumerate(stages):
+        threads.append(threading.Thread(target=_stage_worker,
+                                        args=(fn, queues[i], queues[i + 1], stage_stats[i + 1], stop, item_size),
+                                        daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = _get(queues[-1], stop)
+            if item is _END:
+                break
+            if isinstance(item, _StageError):
+                raise RuntimeError("Pipeline stage '{}' failed".format(item.name)) from item.exc
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def format_stage_report(stats):
+    """Format the per-stage throughput of a finished pipeline run as a printable table."""
+    lines = ['{:<10} {:>8} {:>10} {:>12}'.format('stage', 'items', 'busy (s)', 'items/s')]
+    for s in stats:
+        lines.append('{:<10} {:>8} {:>10.2f} {:>12.1f}'.format(s.name, s.items, s.busy, s.throughput))
+    return '\n'.join(lines)
@@ -0,0 +1,239 @@
+import argparse
+import json
+import threading
+import time
+
+import cv2
+
+from model_registry import get_vehicle_detector, get_license_plate_detector, new_tracker
+from processingVideo import (detect_vehicles, detect_license_plates, track_vehicles, collect_plate_crops,
+                             live_track_ids, classify_candidates, read_plates)
+from stages import run_pipeline, format_stage_report
+
+VEHICLES = [2, 3, 5, 7]  # COCO dataset vehicle class IDs
+
+
+class StreamSource:
+    """
+    One camera (RTSP/HTTP URL, device index or a local video file standing in for a camera).
+
+    A reader thread decodes the stream continuously and keeps only the newest frame; a frame
+    that is replaced before the engine picks it up is counted as dropped, so a slow engine
+    always works on recent frames instead of falling further behind. Files are read at their
+    own frame rate (pace=True) so they behave like a live camera. Each source has its own
+    SORT tracker; a network stream that fails is reopened after reconnect_delay seconds.
+    """
+
+    def __init__(self, name, url, pace=None, reconnect_delay=2.0):
+        self.name = name
+        self.url = url
+        self.is_file = isinstance(url, str) and '://' not in url
+        self.pace = self.is_file if pace is None else pace
+        self.reconnect_delay = reconnect_delay
+        self.tracker = new_tracker()
+        self.best_reads = {}
+        self.frames = 0
+        self.dropped = 0
+        self.processed = 0
+        self.finished = False
+        self._frame = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, stop):
+        self._thread = threading.Thread(target=self._read_loop, args=(stop,), daemon=True)
+        self._thread.start()
+
+    def _read_loop(self, stop):
+        try:
+            while not stop.is_set():
+                cap = cv2.VideoCapture(self.url)
+                interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 25.0) if self.pace else 0.0
+                next_read = time.perf_counter()
+                while not stop.is_set():
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    with self._lock:
+                        if self._frame is not None:
+                            self.dropped += 1
+                        self._frame = (self.frames, time.time(), frame)
+                        self.frames += 1
+                    if interval:
+                        next_read += interval
+                        time.sleep(max(next_read - time.perf_counter(), 0.0))
+                cap.release()
+                if self.is_file:
+                    break
+                stop.wait(self.reconnect_delay)
+        finally:
+            self.finished = True
+
+    def latest(self):
+        """Take the newest decoded frame as (frame_nmr, timestamp, frame), or None if there is no new one."""
+        with self._lock:
+            frame, self._frame = self._frame, None
+        return frame
+
+
+class StreamEngine:
+    """
+    Headless recognition over many live sources sharing one set of models.
+
+    The newest frame of every source is collected into one batch, so each YOLO model and the
+    OCR recognizer run once per batch for all cameras; detection, tracking, color and OCR run as
+    pipeline stages on their own threads (see stages.run_pipeline). Tracking is done per source
+    with the source's own tracker. Queues hold a single batch, so latency stays bounded:
+    sources drop the frames the engine has no time for.
+
+    events() yields one dict per plate read that improves on the best read so far of its track.
+    """
+
+    def __init__(self, sources=None, batch_ocr=True, max_batch=None, poll_interval=0.005):
+        self.sources = []
+        self.batch_ocr = batch_ocr
+        self.max_batch = max_batch
+        self.poll_interval = poll_interval
+        self.stats = []
+        self._stop = threading.Event()
+        for name, url in (sources or []):
+            self.add_source(name, url)
+
+    def add_source(self, name, url, **kwargs):
+        source = StreamSource(name, url, **kwargs)
+        self.sources.append(source)
+        return source
+
+    def stop(self):
+        self._stop.set()
+
+    def _batches(self):
+        """
+        Yield batch items holding the newest frame of every source that has one.
+
+        With max_batch, a full batch ends the round and the next round starts at the source
+        after the last one taken, so every source gets its turn.
+        """
+        start = 0
+        while not self._stop.is_set():
+            item = {'frames': [], 'sources': [], 'frame_nmrs': [], 'timestamps': []}
+            sources = self.sources[start:] + self.sources[:start]
+            for i, source in enumerate(sources):
+                latest = source.latest()
+                if latest is not None:
+                    frame_nmr, timestamp, frame = latest
+                    item['frames'].append(frame)
+                    item['sources'].append(source)
+                    item['frame_nmrs'].append(frame_nmr)
+                    item['timestamps'].append(timestamp)
+                    if self.max_batch and len(item['frames']) >= self.max_batch:
+                        start = (start + i + 1) % len(sources)
+                        break
+            if item['frames']:
+                yield item
+            elif all(source.finished for source in self.sources):
+                return
+            else:
+                self._stop.wait(self.poll_interval)
+
+    def _detect(self, item, coco_model, license_plate_detector):
+        item['detections'] = detect_vehicles(item['frames'], coco_model, VEHICLES)
+        item['plates'] = detect_license_plates(item['frames'], license_plate_detector)
+        return item
+
+    def _track(self, item):
+        item['candidates'] = []
+        item['live_ids'] = []
+        for frame, source, detections_, license_plates in zip(item['frames'], item['sources'],
+                                                              item['detections'], item['plates']):
+            track_ids = track_vehicles(detections_, source.tracker)
+            item['candidates'].append(collect_plate_crops(frame, license_plates, track_ids))
+            item['live_ids'].append(live_track_ids(source.tracker))
+        return item
+
+    def _classify(self, item):
+        classify_candidates(item['candidates'])
+        return item
+
+    def _read(self, item):
+        item['results'] = read_plates(item['candidates'], self.batch_ocr)
+        return item
+
+    def _events(self, item):
+        """Turn the results of a batch into events, one per read that beats its track's best read."""
+        now = time.time()
+        for source, frame_nmr, timestamp, results, live_ids in zip(item['sources'], item['frame_nmrs'],
+                                                                   item['timestamps'], item['results'],
+                                                                   item['live_ids']):
+            source.processed += 1
+            # Forget the tracks SORT has dropped so long-running streams do not accumulate state
+            live_ids = set(live_ids)
+            for car_id in [car_id for car_id in source.best_reads if car_id not in live_ids]:
+                del source.best_reads[car_id]
+            for car_id, result in results.items():
+                plate = result['license_plate']
+                best = source.best_reads.get(car_id)
+                if best is not None and best >= plate['text_score']:
+                    continue
+                source.best_reads[car_id] = plate['text_score']
+                yield {
+                    'source': source.name,
+                    'frame_nmr': frame_nmr,
+                    'timestamp': timestamp,
+                    'latency': now - timestamp,
+                    'car_id': int(car_id),
+                    'car_bbox': [float(v) for v in result['car']['bbox']],
+                    'license_plate_bbox': [float(v) for v in plate['bbox']],
+                    'license_number': plate['text'],
+                    'license_number_score': float(plate['text_score']),
+                    'license_plate_color': plate['color'],
+                }
+
+    def events(self):
+        """Start every source and yield plate events until all sources end or stop() is called."""
+        coco_model = get_vehicle_detector()
+        license_plate_detector = get_license_plate_detector()
+        self._stop.clear()
+        for source in self.sources:
+            source.start(self._stop)
+
+        stages = [('detect', lambda item: self._detect(item, coco_model, license_plate_detector)),
+                  ('track', self._track),
+                  ('color', self._classify),
+                  ('ocr', self._read)]
+        self.stats = []
+        try:
+            for item in run_pipeline(self._batches(), stages, source_name='collect', queue_size=1,
+                                     stats=self.stats, item_size=lambda item: len(item['frames'])):
+                yield from self._events(item)
+        finally:
+            self._stop.set()
+
+    def report(self):
+        lines = [format_stage_report(self.stats)]
+        for source in self.sources:
+            lines.append('{}: {} frames decoded, {} processed, {} dropped'.format(
+                source.name, source.frames, source.processed, source.dropped))
+        return '\n'.join(lines)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Recognize license plates on live camera streams')
+    parser.add_argument('sources', nargs='+', help='RTSP/HTTP URLs or video files standing in for cameras')
+    parser.add_argument('--max-batch', type=int, default=None, help='Maximum number of frames per model call')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    engine = StreamEngine(batch_ocr=True, max_batch=args.max_batch)
+    for i, url in enumerate(args.sources):
+        engine.add_source('camera{}'.format(i), url)
+    try:
+        for event in engine.events():
+            print(json.dumps(event), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        print(engine.report())
@@ -0,0 +1,20 @@
+import numpy as np
+
+from benchmarks.color_benchmark import random_crops, reference_color
+from processingVideo import classify_license_plate_colors
+
+
+def test_colors_match_per_crop_classifier():
+    crops = random_crops(2000)
+    new = classify_license_plate_colors(crops)
+    # The reference could never return "Yellow text on Green"; those crops are green plates
+    expected = [reference_color(crop) for crop in crops]
+    assert len(new) == len(expected)
+    assert all(a == b or (a, b) == ("Green", "Yellow text on Green") for a, b in zip(expected, new))
+
+
+def test_yellow_text_on_green():
+    crop = np.zeros((20, 100, 3), dtype=np.uint8)
+    crop[:] = (0, 160, 0)  # Green plate
+    crop[5:15, 10:90] = (0, 200, 255)  # Yellow characters
+    assert classify_license_plate_colors([crop]) == ["Yellow text on Green"]
@@ -0,0 +1,17 @@
+import numpy as np
+
+from add_missing_data import interpolate_tracks, parse_bboxes
+from benchmarks.interpolation_benchmark import reference_tracks, synthetic_rows
+
+
+def test_interpolate_tracks_matches_interp1d_loop():
+    data = synthetic_rows(5000)
+    frame_numbers = [int(row['frame_nmr']) for row in data]
+    car_ids = [int(float(row['car_id'])) for row in data]
+    car_bboxes = parse_bboxes(row['car_bbox'] for row in data)
+    license_plate_bboxes = parse_bboxes(row['license_plate_bbox'] for row in data)
+
+    tracks = interpolate_tracks(frame_numbers, car_ids, car_bboxes, license_plate_bboxes)
+    reference = reference_tracks(frame_numbers, car_ids, car_bboxes, license_plate_bboxes)
+    for name in ('frame_nmr', 'car_id', 'car_bbox', 'license_plate_bbox'):
+        np.testing.assert_array_equal(tracks[name], reference[name])
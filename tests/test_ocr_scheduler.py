@@ -0,0 +1,31 @@
+from ocr_scheduler import OcrScheduler
+
+PLATE = [0, 0, 40, 10]
+
+
+def read(scheduler, text, score):
+    scheduler.advance()
+    if scheduler.schedule(1, PLATE):
+        scheduler.record(1, text, score, 'White')
+
+
+def test_consistent_reads_confirm_the_track():
+    scheduler = OcrScheduler(confirm_reads=3, recheck_interval=1)
+    for _ in range(3):
+        read(scheduler, 'AB12CDE', 0.9)
+    assert scheduler.tracks[1]['confirmed']
+    assert not scheduler.schedule(1, PLATE)
+
+
+def test_failed_low_or_different_reads_reset_the_streak():
+    for interruption in [(None, 0), ('AB12CDE', 0.1), ('XY98ZZZ', 0.9)]:
+        scheduler = OcrScheduler(confirm_reads=3, recheck_interval=1)
+        read(scheduler, 'AB12CDE', 0.9)
+        read(scheduler, 'AB12CDE', 0.9)
+        read(scheduler, *interruption)
+        read(scheduler, 'AB12CDE', 0.9)
+        assert not scheduler.tracks[1]['confirmed'], interruption
+        read(scheduler, 'AB12CDE', 0.9)
+        read(scheduler, 'AB12CDE', 0.9)
+        assert scheduler.tracks[1]['confirmed'], interruption
+        assert scheduler.cached(1) == ('AB12CDE', 0.9, 'White')
@@ -0,0 +1,99 @@
+import string
+
+import numpy as np
+
+from plate_aggregator import PlateAggregator
+from results_table import ResultsTable
+
+
+def synthetic_table(n_rows, n_cars=None, seed=0):
+    """Rows of n_cars cars (default n_rows // 100), in frame order like process_input output."""
+    rng = np.random.RandomState(seed)
+    n_cars = n_cars or max(n_rows // 100, 1)
+    alphabet = np.array(list(string.ascii_uppercase + string.digits))
+    plates = [''.join(rng.choice(alphabet, size=7)) for _ in range(n_cars)]
+    car_index = rng.randint(0, n_cars, size=n_rows)
+    frame_nmr = np.sort(rng.randint(0, max(n_rows // 5, 1), size=n_rows))
+    texts = []
+    for car in car_index:
+        chars = list(plates[car])
+        for j in np.flatnonzero(rng.uniform(size=7) < 0.1):
+            chars[j] = rng.choice(alphabet)
+        if rng.uniform() < 0.05:
+            chars = chars[:-1]
+        texts.append(''.join(chars))
+    score = rng.uniform(size=n_rows)
+    interpolated = rng.uniform(size=n_rows) < 0.2
+    score[interpolated] = 0
+    texts = np.where(interpolated, '0', np.array(texts))
+    # Keep one row per (frame, car), as in a frame's results dict
+    _, first = np.unique(frame_nmr * n_cars + car_index, return_index=True)
+    return ResultsTable({
+        'frame_nmr': frame_nmr[first],
+        'car_id': car_index[first] + 1,
+        'car_bbox': rng.uniform(0, 2000, size=(len(first), 4)),
+        'license_plate_bbox': rng.uniform(0, 2000, size=(len(first), 4)),
+        'license_plate_bbox_score': rng.uniform(size=len(first)),
+        'license_number': texts[first],
+        'license_number_score': score[first],
+        'license_plate_color': np.full(len(first), 'White'),
+    })
+
+
+def frame_results(table):
+    """The table as the {frame_nmr: {car_id: {'car': ..., 'license_plate': ...}}} dicts process_input writes."""
+    frames = {}
+    for row in table.to_records():
+        frames.setdefault(row['frame_nmr'], {})[row['car_id']] = {
+            'car': {'bbox': row['car_bbox']},
+            'license_plate': {'bbox': row['license_plate_bbox'], 'text': row['license_number'],
+                              'bbox_score': row['license_plate_bbox_score'],
+                              'text_score': row['license_number_score'], 'color': row['license_plate_color']}}
+    return frames
+
+
+def aggregate_frames(frames, **kwargs):
+    aggregator = PlateAggregator(**kwargs)
+    for frame_nmr, results in frames.items():
+        aggregator.write_frame(frame_nmr, results)
+    aggregator.close()
+    return aggregator
+
+
+def assert_same_plates(a, b):
+    """Same cars with the same voted text, reads, frame span and best read; confidences within rounding."""
+    assert len(a) == len(b)
+    for x, y in zip(a, b):
+        assert {k: v for k, v in x.items() if k != 'vote_confidence'} == \
+               {k: v for k, v in y.items() if k != 'vote_confidence'}
+    np.testing.assert_allclose([x['vote_confidence'] for x in a], [y['vote_confidence'] for y in b])
+
+
+def test_from_table_matches_frame_by_frame():
+    table = synthetic_table(5000)
+    by_frame = aggregate_frames(frame_results(table), forget_after=None)
+    assert_same_plates(by_frame.plates(), PlateAggregator.from_table(table).plates())
+
+
+def test_forget_after_bounds_vote_state():
+    aggregator = PlateAggregator(end_after=5, forget_after=10)
+    for frame_nmr in range(1000):
+        aggregator.write(frame_nmr, frame_nmr + 1, [0, 0, 10, 10], [0, 0, 5, 5], 0.9, 'AB12CDE', 0.5, 'White')
+        aggregator.end_tracks(frame_nmr - aggregator.end_after)
+        aggregator.forget_tracks(frame_nmr - aggregator.forget_after)
+    aggregator.close()
+    assert len(aggregator.ended) <= 20
+    assert len(aggregator.plates()) == 1000
+
+
+def test_cached_reads_do_not_vote():
+    aggregator = PlateAggregator()
+    plate = {'bbox': [0, 0, 5, 5], 'bbox_score': 0.9, 'color': 'White'}
+    aggregator.write_frame(0, {1: {'car': {'bbox': [0, 0, 10, 10]},
+                                   'license_plate': {**plate, 'text': 'AB12CDE', 'text_score': 0.4}}})
+    for frame_nmr in range(1, 5):
+        aggregator.write_frame(frame_nmr, {1: {'car': {'bbox': [0, 0, 10, 10]},
+                                               'license_plate': {**plate, 'text': 'XY98ZZZ', 'text_score': 0.3,
+                                                                 'cached': True}}})
+    aggregator.close()
+    assert aggregator.plate(1)['license_number'] == 'AB12CDE'
@@ -0,0 +1,8 @@
+from benchmarks.plate_grammar_benchmark import random_reads, reference_correct
+from plate_grammar import PlateGrammar
+
+
+def test_uk_grammar_matches_old_format_checks():
+    reads = random_reads(20000)
+    reads += ['AB12CDE', 'A812CDE', 'ABI2CDE', 'AB12C0E', 'ab12 cde', 'AB12CD', 'AB12CDEF']
+    assert PlateGrammar([('UK', 'AA00AAA')]).correct(reads) == [reference_correct(text) for text in reads]
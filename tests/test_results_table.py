@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from benchmarks.results_format_benchmark import synthetic_table
+from results_table import ResultsCollector, ResultsTable, read_results, write_results
+
+
+def test_csv_and_columns_read_back_the_same(tmp_path):
+    table = synthetic_table(2000)
+    from_csv = read_results(write_results(table, str(tmp_path / 'results.csv'), brackets=True))
+    from_columns = read_results(write_results(table, str(tmp_path / 'results')))
+    assert from_csv.columns.keys() == from_columns.columns.keys()
+    for name in from_csv.columns:
+        np.testing.assert_array_equal(from_csv[name], from_columns[name])
+    np.testing.assert_array_equal(from_columns['car_bbox'], table['car_bbox'])
+
+
+def test_long_text_raises_instead_of_truncating():
+    frame = synthetic_table(3).to_dataframe()
+    frame['license_number'] = ['AB12CDE', 'AB12CDEFGHIJKLMNOPQ', '0']
+    with pytest.raises(ValueError):
+        ResultsTable.from_dataframe(frame)
+
+    collector = ResultsCollector()
+    collector.write(0, 1, [0, 0, 10, 10], [0, 0, 5, 5], 0.9, 'AB12CDEFGHIJKLMNOPQ', 0.5, 'White')
+    with pytest.raises(ValueError):
+        collector.table()
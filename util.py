@@ -1,49 +1,119 @@
-import string
-import easyocr
+import os
+import numpy as np
 
-# Initialize the OCR reader
-reader = easyocr.Reader(['en'], gpu=True)
+from model_registry import get_ocr_reader
+from plate_grammar import get_plate_grammar
+from results_table import ResultsWriter, frame_rows, is_csv
 
-# Mapping dictionaries for character conversion
-dict_char_to_int = {'O': '0',
-                    'I': '1',
-                    'J': '3',
-                    'A': '4',
-                    'G': '6',
-                    'S': '5'}
 
-dict_int_to_char = {'0': 'O',
-                    '1': 'I',
-                    '3': 'J',
-                    '4': 'A',
-                    '6': 'G',
-                    '5': 'S'}
+CSV_HEADER = ['frame_nmr', 'car_id', 'car_bbox', 'license_plate_bbox', 'license_plate_bbox_score', 'license_number',
+              'license_number_score', 'license_plate_color']
+
+
+class ResultsSink:
+    """
+    Append detection results to a CSV file as frames finish, instead of keeping them all in memory.
+
+    Rows use the same layout as write_csv. The file is flushed every flush_every frames, so
+    a crash loses at most those frames. With resume=True an existing file is kept: the rows
+    of its last frame (which may be incomplete) are dropped and next_frame tells the caller
+    where to restart; max_car_id is the highest track id already written.
+    """
+
+    def __init__(self, output_path, flush_every=50, resume=False):
+        self.output_path = output_path
+        self.flush_every = flush_every
+        self.next_frame = 0
+        self.max_car_id = 0
+        self.rows = 0
+        self._pending_frames = 0
+
+        if resume and os.path.exists(output_path) and self._truncate_last_frame():
+            self.f = open(output_path, 'a')
+        else:
+            self.f = open(output_path, 'w')
+            self.f.write('{},{},{},{},{},{},{},{}\n'.format(*CSV_HEADER))
+
+    def _truncate_last_frame(self):
+        """Drop the rows of the last (possibly partially written) frame of an existing file."""
+        with open(self.output_path, 'rb') as f:
+            lines = f.read().split(b'\n')
+        if len(lines) < 2 or not lines[0].startswith(b'frame_nmr'):
+            return False
+
+        offset = len(lines[0]) + 1
+        rows = []
+        for line in lines[1:-1]:  # The last element is empty or an unterminated row
+            frame_nmr, car_id = line.split(b',', 2)[:2]
+            rows.append((int(frame_nmr), float(car_id), offset))
+            offset += len(line) + 1
+
+        if rows:
+            self.next_frame = rows[-1][0]
+            kept = len(rows)
+            while kept > 0 and rows[kept - 1][0] == self.next_frame:
+                kept -= 1
+            offset = rows[kept][2]
+            self.max_car_id = int(max(row[1] for row in rows[:kept])) if kept else 0
+            self.rows = kept
+        with open(self.output_path, 'r+b') as f:
+            f.truncate(offset)
+        return True
+
+    def write(self, frame_nmr, car_id, car_bbox, license_plate_bbox, bbox_score, text, text_score, color):
+        """Append one row."""
+        self.f.write('{},{},{},{},{},{},{},{}\n'.format(frame_nmr,
+                                                        car_id,
+                                                        '[{} {} {} {}]'.format(*car_bbox),
+                                                        '[{} {} {} {}]'.format(*license_plate_bbox),
+                                                        bbox_score,
+                                                        text,
+                                                        text_score,
+                                                        color))
+        self.rows += 1
+
+    def write_frame(self, frame_nmr, frame_results):
+        """Append the rows of one frame, given as the {car_id: {'car': ..., 'license_plate': ...}} dict."""
+        for row in frame_rows(frame_results):
+            self.write(frame_nmr, *row)
+
+        self._pending_frames += 1
+        if self._pending_frames >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self._pending_frames = 0
+
+    def close(self):
+        if not self.f.closed:
+            self.flush()
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_results_sink(output_path, flush_every=50, resume=False):
+    """Open a ResultsSink for a .csv path and a results_table.ResultsWriter (column directory) for any other path."""
+    sink_class = ResultsSink if is_csv(output_path) else ResultsWriter
+    return sink_class(output_path, flush_every=flush_every, resume=resume)
 
 
 def write_csv(results, output_path):
     """Write the results to a CSV file."""
-    with open(output_path, 'w') as f:
-        f.write('{},{},{},{},{},{},{},{}\n'.format('frame_nmr', 'car_id', 'car_bbox',
-                                                    'license_plate_bbox', 'license_plate_bbox_score', 'license_number',
-                                                    'license_number_score', 'license_plate_color'))
-        
+    with ResultsSink(output_path) as sink:
         for frame_nmr in results.keys():
-            for car_id in results[frame_nmr].keys():
-                if 'car' in results[frame_nmr][car_id] and 'license_plate' in results[frame_nmr][car_id]:
-                    f.write('{},{},{},{},{},{},{},{}\n'.format(frame_nmr,
-                                                                car_id,
-                                                                '[{} {} {} {}]'.format(*results[frame_nmr][car_id]['car']['bbox']),
-                                                                '[{} {} {} {}]'.format(*results[frame_nmr][car_id]['license_plate']['bbox']),
-                                                                results[frame_nmr][car_id]['license_plate']['bbox_score'],
-                                                                results[frame_nmr][car_id]['license_plate']['text'],
-                                                                results[frame_nmr][car_id]['license_plate']['text_score'],
-                                                                results[frame_nmr][car_id]['license_plate']['color']))
-        f.close()
+            sink.write_frame(frame_nmr, results[frame_nmr])
 
 
 def license_complies_format(text):
     """
-    Check if the license plate text complies with the required format.
+    Check if the license plate text complies with one of the plate formats (plate_grammar.PLATE_FORMATS).
 
     Args:
         text (str): License plate text.
@@ -51,19 +121,7 @@ def license_complies_format(text):
     Returns:
         bool: True if the license plate complies with the format, False otherwise.
     """
-    if len(text) != 7:
-        return False
-
-    if (text[0] in string.ascii_uppercase or text[0] in dict_int_to_char.keys()) and \
-       (text[1] in string.ascii_uppercase or text[1] in dict_int_to_char.keys()) and \
-       (text[2] in ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9'] or text[2] in dict_char_to_int.keys()) and \
-       (text[3] in ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9'] or text[3] in dict_char_to_int.keys()) and \
-       (text[4] in string.ascii_uppercase or text[4] in dict_int_to_char.keys()) and \
-       (text[5] in string.ascii_uppercase or text[5] in dict_int_to_char.keys()) and \
-       (text[6] in string.ascii_uppercase or text[6] in dict_int_to_char.keys()):
-        return True
-    else:
-        return False
+    return get_plate_grammar().correct([text])[0] is not None
 
 
 def format_license(text):
@@ -74,18 +132,9 @@ def format_license(text):
         text (str): License plate text.
 
     Returns:
-        str: Formatted license plate text.
-    """
-    license_plate_ = ''
-    mapping = {0: dict_int_to_char, 1: dict_int_to_char, 4: dict_int_to_char, 5: dict_int_to_char, 6: dict_int_to_char,
-               2: dict_char_to_int, 3: dict_char_to_int}
-    for j in [0, 1, 2, 3, 4, 5, 6]:
-        if text[j] in mapping[j].keys():
-            license_plate_ += mapping[j][text[j]]
-        else:
-            license_plate_ += text[j]
-
-    return license_plate_
+        str: Formatted license plate text, or None if it complies with no plate format.
+    """
+    return get_plate_grammar().correct([text])[0]
 
 
 def read_license_plate(license_plate_crop):
@@ -99,17 +148,115 @@ def read_license_plate(license_plate_crop):
         tuple: Tuple containing the formatted license plate text and its confidence score.
     """
 
-    detections = reader.readtext(license_plate_crop)
+    detections = get_ocr_reader().readtext(license_plate_crop)
 
-    for detection in detections:
-        bbox, text, score = detection
+    # Check every text read on the crop in one call and keep the first valid one
+    i, text = get_plate_grammar().first_valid([text for bbox, text, score in detections])
+    if i is None:
+        return None, None
+    return text, detections[i][2]
 
-        text = text.upper().replace(' ', '')
 
-        if license_complies_format(text):
-            return format_license(text), score
+def _recognize_batch(reader, image, horizontal_list):
+    """
+    Run the easyocr recognition model once over every text region of image.
 
-    return None, None
+    Reader.recognize only batches regions on GPU; on CPU it reads them one at a time. The
+    regions are prepared and decoded with the same easyocr helpers it uses (get_image_list,
+    get_text, with its default settings), but in a single batch on every device.
+
+    Returns:
+        list: One (bbox, text, score) tuple per region, bbox as four corner points.
+    """
+    from easyocr.config import imgH
+    from easyocr.recognition import get_text
+    from easyocr.utils import get_image_list
+
+    image_list, max_width = get_image_list(horizontal_list, [], image, model_height=imgH)
+    ignore_char = ''.join(set(reader.character) - set(reader.lang_char))
+    return get_text(reader.character, imgH, int(max_width), reader.recognizer, reader.converter, image_list,
+                    ignore_char=ignore_char, batch_size=len(image_list), workers=0, device=reader.device)
+
+
+def read_license_plates(license_plate_crops):
+    """
+    Read the license plate text from a batch of cropped images with a single recognizer call.
+
+    The crops are stacked into one canvas and read as pre-cropped text regions, so the text
+    detector is skipped, and all regions go through the recognition model as one batch (see
+    _recognize_batch) instead of one readtext call per crop.
+
+    Args:
+        license_plate_crops (list): Thresholded grayscale license plate crops (numpy.ndarray).
+
+    Returns:
+        list: One (text, score) tuple per crop, (None, None) where no compliant text was read.
+    """
+    reads = [(None, None)] * len(license_plate_crops)
+    crops = [crop for crop in license_plate_crops if crop is not None and crop.size > 0]
+    if not crops:
+        return reads
+
+    canvas = np.zeros((sum(crop.shape[0] for crop in crops), max(crop.shape[1] for crop in crops)), dtype=np.uint8)
+    horizontal_list = []
+    index_by_y = {}
+    y = 0
+    for i, crop in enumerate(license_plate_crops):
+        if crop is None or crop.size == 0:
+            continue
+        h, w = crop.shape[:2]
+        canvas[y:y + h, :w] = crop
+        horizontal_list.append([0, w, y, y + h])
+        index_by_y[y] = i
+        y += h
+
+    detections = _recognize_batch(get_ocr_reader(), canvas, horizontal_list)
+
+    detections = [(index_by_y.get(int(bbox[0][1])), text, score) for bbox, text, score in detections]
+    detections = [detection for detection in detections if detection[0] is not None]
+    texts = get_plate_grammar().correct([text for i, text, score in detections])
+    for (i, _, score), text in zip(detections, texts):
+        if text is not None:
+            reads[i] = (text, score)
+
+    return reads
+
+
+def get_cars(license_plates, vehicle_track_ids):
+    """
+    Assign every license plate of a frame to a tracked vehicle in one vectorized pass.
+
+    A plate belongs to a vehicle whose box strictly contains it. When several vehicle boxes
+    contain the plate (overlapping cars), the one with the highest IoU wins, i.e. the smallest
+    box, so the result no longer depends on the order of the tracks.
+
+    Args:
+        license_plates (list): License plate boxes (x1, y1, x2, y2, score, class_id).
+        vehicle_track_ids (numpy.ndarray): Tracked vehicles (x1, y1, x2, y2, car_id).
+
+    Returns:
+        numpy.ndarray: One (x1, y1, x2, y2, car_id) row per plate, all -1 for plates without a vehicle.
+    """
+    plates = np.asarray(license_plates, dtype=float).reshape(-1, 6)[:, :4]
+    cars = np.asarray(vehicle_track_ids, dtype=float).reshape(-1, 5)
+    assigned = np.full((len(plates), 5), -1.0)
+    if len(plates) == 0 or len(cars) == 0:
+        return assigned
+
+    plate_boxes = plates[:, None, :]
+    car_boxes = cars[None, :, :4]
+    contains = np.all(plate_boxes[..., :2] > car_boxes[..., :2], axis=2) & \
+        np.all(plate_boxes[..., 2:] < car_boxes[..., 2:], axis=2)
+
+    # A contained plate's IoU with a car is plate area / car area
+    plate_area = (plates[:, 2] - plates[:, 0]) * (plates[:, 3] - plates[:, 1])
+    car_area = (cars[:, 2] - cars[:, 0]) * (cars[:, 3] - cars[:, 1])
+    iou = np.where(contains, plate_area[:, None] / car_area[None, :], -1.0)
+
+    best = np.argmax(iou, axis=1)
+    found = contains[np.arange(len(plates)), best]
+    assigned[found] = cars[best[found]]
+    return assigned
 
 
 def get_car(license_plate, vehicle_track_ids):
@@ -123,18 +270,4 @@ def get_car(license_plate, vehicle_track_ids):
     Returns:
         tuple: Tuple containing the vehicle coordinates (x1, y1, x2, y2) and ID.
     """
-    x1, y1, x2, y2, score, class_id = license_plate
-
-    foundIt = False
-    for j in range(len(vehicle_track_ids)):
-        xcar1, ycar1, xcar2, ycar2, car_id = vehicle_track_ids[j]
-
-        if x1 > xcar1 and y1 > ycar1 and x2 < xcar2 and y2 < ycar2:
-            car_indx = j
-            foundIt = True
-            break
-
-    if foundIt:
-        return vehicle_track_ids[car_indx]
-
-    return -1, -1, -1, -1, -1
+    return tuple(get_cars([license_plate], vehicle_track_ids)[0])
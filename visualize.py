@@ -1,7 +1,7 @@
-import ast
 import cv2
 import numpy as np
-import pandas as pd
+from render import RenderOptions, open_video_writer
+from results_table import ResultsTable, read_results
 
 def draw_border(img, top_left, bottom_right, color=(0, 255, 0), thickness=10, line_length_x=200, line_length_y=200):
     """Draws a stylized border around detected objects."""
@@ -23,101 +23,234 @@ def draw_border(img, top_left, bottom_right, color=(0, 255, 0), thickness=10, li
     return img
 
 def load_results(csv_path):
-    """Loads detection results from CSV."""
-    return pd.read_csv(csv_path)
+    """Loads detection results from a CSV file or a column directory (see results_table)."""
+    return read_results(csv_path)
 
-def initialize_video(video_path, output_path):
-    """Initializes video input and output settings."""
+def initialize_video(video_path, output_path, options=None):
+    """Initializes video input and output settings; the writer follows options (see render.RenderOptions)."""
+    options = options or RenderOptions()
     cap = cv2.VideoCapture(video_path)
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     fps = cap.get(cv2.CAP_PROP_FPS)
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    out = open_video_writer(output_path, fps / options.frame_step, options.output_size(width, height), options)
     return cap, out, fps, width, height
 
-def extract_best_license_plates(cap, results):
-    """Extracts the best license plate for each detected vehicle."""
-    license_plate = {}
-    for car_id in np.unique(results['car_id']):
-        max_score = np.amax(results[results['car_id'] == car_id]['license_number_score'])
-        best_plate_data = results[(results['car_id'] == car_id) & 
-                                  (results['license_number_score'] == max_score)].iloc[0]
-        
-        plate_number = best_plate_data['license_number']
-        frame_number = best_plate_data['frame_nmr']
-        bbox_str = best_plate_data['license_plate_bbox']
-
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-        ret, frame = cap.read()
+class FrameIndex:
+    """
+    Detection results indexed by frame number.
+
+    Rows are sorted by frame once, so the rows of any frame are the slice
+    offsets[frame_nmr]:offsets[frame_nmr + 1]. results is a ResultsTable, or a
+    DataFrame with the CSV columns.
+    """
+
+    def __init__(self, results):
+        if not isinstance(results, ResultsTable):
+            results = ResultsTable.from_dataframe(results)
+        order = np.argsort(results['frame_nmr'], kind='stable')
+        self.results = results
+        self.position = np.empty_like(order)  # Position of each original row in the sorted rows
+        self.position[order] = np.arange(len(order))
+        self.frame_nmr = results['frame_nmr'][order]
+        self.car_id = results['car_id'][order]
+        self.car_bbox = results['car_bbox'][order]
+        self.license_plate_bbox = results['license_plate_bbox'][order]
+        self.license_number = results['license_number'][order]
+        self.license_number_score = results['license_number_score'][order]
+
+        counts = np.bincount(self.frame_nmr, minlength=1) if len(self.frame_nmr) else np.zeros(1, dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def __len__(self):
+        return len(self.frame_nmr)
+
+    def rows(self, frame_nmr):
+        """Returns the row indices of one frame as a range."""
+        if frame_nmr < 0 or frame_nmr + 1 >= len(self.offsets):
+            return range(0)
+        return range(self.offsets[frame_nmr], self.offsets[frame_nmr + 1])
+
+    def best_rows(self):
+        """Returns, per car_id, the index of its highest-scoring row (first one in the original order on ties)."""
+        best = self.results.best_rows()
+        return dict(zip(self.results['car_id'][best].tolist(), self.position[best].tolist()))
 
-        if ret:
-            x1, y1, x2, y2 = ast.literal_eval(bbox_str.replace('[ ', '[').replace('   ', ' ').replace('  ', ' ').replace(' ', ','))
-            license_crop = frame[int(y1):int(y2), int(x1):int(x2), :]
-            license_crop = cv2.resize(license_crop, (int((x2 - x1) * 400 / (y2 - y1)), 400))
+def index_results(results):
+    """Builds a FrameIndex from a ResultsTable or DataFrame, passing an existing FrameIndex through."""
+    return results if isinstance(results, FrameIndex) else FrameIndex(results)
 
-            license_plate[car_id] = {'license_crop': license_crop, 'license_plate_number': plate_number}
+def plan_best_license_plates(results):
+    """Works out, for each detected vehicle, the frame holding its best license plate read."""
+    results = index_results(results)
+    return {car_id: {'frame_nmr': int(results.frame_nmr[i]),
+                     'bbox': results.license_plate_bbox[i],
+                     'license_plate_number': results.license_number[i]}
+            for car_id, i in results.best_rows().items()}
+
+def resize_license_crop(license_crop, bbox, height=400):
+    """Scales a license plate crop cut at bbox to the overlay height."""
+    x1, y1, x2, y2 = bbox
+    return cv2.resize(license_crop, (int((x2 - x1) * height / (y2 - y1)), height))
+
+def crop_license_plate(frame, bbox, height=400):
+    """Cuts the license plate out of a frame and scales it to the overlay height."""
+    x1, y1, x2, y2 = bbox
+    return resize_license_crop(frame[int(y1):int(y2), int(x1):int(x2), :], bbox, height)
+
+def scale_best_crops(best_crops, height=400):
+    """
+    Scales unscaled best plate crops ({car_id: {'crop', 'bbox', 'license_plate_number'}}, e.g.
+    from plate_aggregator.PlateAggregator.best_crops()) into the license_plate form process_video takes.
+    """
+    return {car_id: {'license_crop': resize_license_crop(best['crop'], best['bbox'], height),
+                     'license_plate_number': best['license_plate_number']}
+            for car_id, best in best_crops.items()}
+
+def extract_best_license_plates(cap, results, height=400):
+    """
+    Extracts the best license plate for each detected vehicle in one sequential pass over the video.
+
+    Only the frames holding a best read are decoded, and the pass stops after the last of them.
+    """
+    plan = plan_best_license_plates(results)
+    by_frame = {}
+    for car_id, best in plan.items():
+        by_frame.setdefault(best['frame_nmr'], []).append(car_id)
+
+    license_plate = {}
+    frame_nmr = -1
+    while by_frame:
+        frame_nmr += 1
+        if frame_nmr not in by_frame:
+            if not cap.grab():
+                break
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        for car_id in by_frame.pop(frame_nmr):
+            license_plate[car_id] = {'license_crop': crop_license_plate(frame, plan[car_id]['bbox'], height),
+                                     'license_plate_number': plan[car_id]['license_plate_number']}
 
     return license_plate
 
-def overlay_license_plate(frame, license_crop, plate_number, car_x1, car_x2, car_y1, H):
-    """Overlays the license plate crop and text on the frame."""
+def overlay_license_plate(frame, license_crop, plate_number, car_x1, car_x2, car_y1, H, scale=1.0):
+    """Overlays the license plate crop and text on the frame; scale shrinks the margins and text with the frame."""
     W = license_crop.shape[1]
-    
+    margin, top, middle = int(100 * scale), int(400 * scale), int(250 * scale)
+    font_scale, thickness = 4.3 * scale, max(int(17 * scale), 1)
+
     try:
-        frame[int(car_y1) - H - 100:int(car_y1) - 100,
+        frame[int(car_y1) - H - margin:int(car_y1) - margin,
               int((car_x2 + car_x1 - W) / 2):int((car_x2 + car_x1 + W) / 2), :] = license_crop
 
-        frame[int(car_y1) - H - 400:int(car_y1) - H - 100,
+        frame[int(car_y1) - H - top:int(car_y1) - H - margin,
               int((car_x2 + car_x1 - W) / 2):int((car_x2 + car_x1 + W) / 2), :] = (255, 255, 255)
 
-        (text_width, text_height), _ = cv2.getTextSize(plate_number, cv2.FONT_HERSHEY_SIMPLEX, 4.3, 17)
+        (text_width, text_height), _ = cv2.getTextSize(plate_number, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
 
         cv2.putText(frame, plate_number,
-                    (int((car_x2 + car_x1 - text_width) / 2), int(car_y1 - H - 250 + (text_height / 2))),
-                    cv2.FONT_HERSHEY_SIMPLEX, 4.3, (0, 0, 0), 17)
+                    (int((car_x2 + car_x1 - text_width) / 2), int(car_y1 - H - middle + (text_height / 2))),
+                    cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), thickness)
     except:
         pass
 
-def process_video(cap, out, results, license_plate):
-    """Processes the video frame by frame, drawing bounding boxes and overlaying license plates."""
-    frame_nmr = -1
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-    ret = True
+def draw_frame(frame, results, rows, license_plate, scale=1.0):
+    """
+    Draws the vehicle and plate boxes of the given FrameIndex rows and overlays each vehicle's best plate.
 
-    while ret:
-        ret, frame = cap.read()
-        frame_nmr += 1
+    scale is the size of frame relative to the video the results refer to.
+    """
+    border, line_length, plate_thickness = max(int(25 * scale), 1), int(200 * scale), max(int(12 * scale), 1)
+    for i in rows:
+        car_id = results.car_id[i]
+        car_x1, car_y1, car_x2, car_y2 = results.car_bbox[i] * scale
+        draw_border(frame, (int(car_x1), int(car_y1)), (int(car_x2), int(car_y2)), (0, 255, 0), border,
+                    line_length, line_length)
 
-        if ret:
-            df_ = results[results['frame_nmr'] == frame_nmr]
-            for _, row in df_.iterrows():
-                car_x1, car_y1, car_x2, car_y2 = ast.literal_eval(row['car_bbox'].replace('[ ', '[').replace('   ', ' ').replace('  ', ' ').replace(' ', ','))
-                draw_border(frame, (int(car_x1), int(car_y1)), (int(car_x2), int(car_y2)), (0, 255, 0), 25)
+        x1, y1, x2, y2 = results.license_plate_bbox[i] * scale
+        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), plate_thickness)
 
-                x1, y1, x2, y2 = ast.literal_eval(row['license_plate_bbox'].replace('[ ', '[').replace('   ', ' ').replace('  ', ' ').replace(' ', ','))
-                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), 12)
+        if car_id in license_plate:
+            license_crop = license_plate[car_id]['license_crop']
+            H = license_crop.shape[0]
+            overlay_license_plate(frame, license_crop, license_plate[car_id]['license_plate_number'], car_x1, car_x2,
+                                  car_y1, H, scale)
+    return frame
 
-                license_crop = license_plate[row['car_id']]['license_crop']
-                H = license_crop.shape[0]
-                overlay_license_plate(frame, license_crop, license_plate[row['car_id']]['license_plate_number'], car_x1, car_x2, car_y1, H)
+def process_video(cap, out, results, license_plate, options=None):
+    """
+    Processes the video in one sequential pass, drawing bounding boxes and overlaying license plates.
 
-            out.write(frame)
-            frame = cv2.resize(frame, (1280, 720))
+    license_plate holds the best plate crop and text of every car, e.g. from
+    scale_best_crops(PlateAggregator.best_crops()), whose crops are kept while the frames are
+    detected, or from extract_best_license_plates on a separate capture when only the results are saved.
+    results can be a ResultsTable, a DataFrame or a FrameIndex; each frame's rows are an O(1) lookup.
+
+    options (a render.RenderOptions) sets the output scale and frame step and whether plate
+    crops are overlaid. Frames without detections are written as they are.
+    """
+    options = options or RenderOptions()
+    scale = options.scale
+    results = index_results(results)
+    if not options.overlays:
+        license_plate = {}
+    elif scale != 1.0:
+        license_plate = {car_id: {**plate, 'license_crop': cv2.resize(
+            plate['license_crop'], (int(plate['license_crop'].shape[1] * scale), int(400 * scale)))}
+            for car_id, plate in license_plate.items()}
+
+    frame_nmr = -1
+    size = None
+
+    while True:
+        frame_nmr += 1
+        if frame_nmr % options.frame_step:
+            # Dropped frame: skip decoding it
+            if not cap.grab():
+                break
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        if size is None:
+            size = options.output_size(frame.shape[1], frame.shape[0])
+        if scale != 1.0:
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        elif size != (frame.shape[1], frame.shape[0]):
+            # Odd sizes rounded down for the encoder: drop the last row or column
+            frame = frame[:size[1], :size[0]]
+        rows = results.rows(frame_nmr)
+        out.write(draw_frame(frame, results, rows, license_plate, scale) if len(rows) else frame)
 
     out.release()
     cap.release()
 
-def video_output(video_path, output_path, csv_path):
-    """function to execute the vehicle license plate detection pipeline."""
+def video_output(video_path, output_path, csv_path, license_plate, options=None):
+    """
+    function to execute the vehicle license plate detection pipeline.
+
+    options is a render.RenderOptions (default: RenderOptions.from_env()); when rendering is
+    disabled nothing is written and None is returned, otherwise output_path. license_plate is
+    passed on to process_video.
+    """
     # csv_path = 'output/test_interpolated.csv'
     # video_path = 'sample1.mp4'
     # output_path = './out.mp4'
 
-    results = load_results(csv_path)
-    cap, out, fps, width, height = initialize_video(video_path, output_path)
-    license_plate = extract_best_license_plates(cap, results)
-    process_video(cap, out, results, license_plate)
+    options = options or RenderOptions.from_env()
+    if not options.enabled or output_path is None:
+        return None
+    results = index_results(load_results(csv_path))
+    cap, out, fps, width, height = initialize_video(video_path, output_path, options)
+    process_video(cap, out, results, license_plate, options=options)
+    return output_path
 
 if __name__ == "__main__":
-    video_output("uploads/sample1.mp4", "frontend/static/results/sample1.mp4", "output/test_interpolated.csv")
+    cap = cv2.VideoCapture("uploads/sample1.mp4")
+    license_plate = extract_best_license_plates(cap, load_results("output/test_interpolated.csv"))
+    cap.release()
+    video_output("uploads/sample1.mp4", "frontend/static/results/sample1.mp4", "output/test_interpolated.csv",
+                 license_plate)